@@ -0,0 +1,31 @@
+"""Added books keyset pagination indexes
+
+Revision ID: 3f1c2a9d7b4e
+Revises: e488f65fff38
+Create Date: 2026-10-17 09:12:41.204518
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = '3f1c2a9d7b4e'
+down_revision: Union[str, None] = 'e488f65fff38'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_books_title_id', 'books', ['title', 'id'])
+    op.create_index('ix_books_genre_id', 'books', ['genre', 'id'])
+    op.create_index('ix_books_published_year_id', 'books', ['published_year', 'id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_books_published_year_id', table_name='books')
+    op.drop_index('ix_books_genre_id', table_name='books')
+    op.drop_index('ix_books_title_id', table_name='books')
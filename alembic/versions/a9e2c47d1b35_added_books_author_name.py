@@ -0,0 +1,94 @@
+"""Added denormalized books.author_name
+
+Revision ID: a9e2c47d1b35
+Revises: d1f7b3c86e0a
+Create Date: 2026-10-17 15:02:11.408317
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9e2c47d1b35'
+down_revision: Union[str, None] = 'd1f7b3c86e0a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+LISTING_INCLUDE = ['genre', 'published_year', 'author_id', 'author_name', 'version', 'updated_at']
+SORT_INDEXES = {
+    'ix_books_title_id': 'title',
+    'ix_books_genre_id': 'genre',
+    'ix_books_published_year_id': 'published_year',
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+
+    # A plain ADD COLUMN rather than batch mode: rebuilding books on SQLite would drop its search triggers
+    op.add_column('books', sa.Column('author_name', sa.String(), nullable=True))
+    op.execute("UPDATE books SET author_name = (SELECT name FROM authors WHERE authors.id = books.author_id)")
+
+    if dialect == 'postgresql':
+        op.execute("""CREATE OR REPLACE FUNCTION books_set_author_name() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'UPDATE' OR NEW.author_name IS NULL THEN
+                SELECT name INTO NEW.author_name FROM authors WHERE id = NEW.author_id;
+            END IF;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql""")
+        op.execute("""CREATE TRIGGER books_set_author_name BEFORE INSERT OR UPDATE OF author_id ON books
+        FOR EACH ROW EXECUTE FUNCTION books_set_author_name()""")
+        op.execute("""CREATE OR REPLACE FUNCTION authors_propagate_name() RETURNS trigger AS $$
+        BEGIN
+            UPDATE books SET author_name = NEW.name WHERE author_id = NEW.id;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql""")
+        op.execute("""CREATE TRIGGER authors_propagate_name AFTER UPDATE OF name ON authors
+        FOR EACH ROW WHEN (NEW.name IS DISTINCT FROM OLD.name) EXECUTE FUNCTION authors_propagate_name()""")
+
+        # Rebuild the sort indexes as covering indexes so listing pages can be served by index-only scans
+        for name, column in SORT_INDEXES.items():
+            include = [included for included in ['title'] + LISTING_INCLUDE if included != column]
+            op.drop_index(name, table_name='books')
+            op.create_index(name, 'books', [column, 'id'], postgresql_include=include)
+
+    elif dialect == 'sqlite':
+        op.execute("""CREATE TRIGGER books_author_name_insert AFTER INSERT ON books
+        WHEN NEW.author_name IS NULL BEGIN
+            UPDATE books SET author_name = (SELECT name FROM authors WHERE id = NEW.author_id) WHERE id = NEW.id;
+        END""")
+        op.execute("""CREATE TRIGGER books_author_name_update AFTER UPDATE OF author_id ON books
+        WHEN NEW.author_name IS NOT (SELECT name FROM authors WHERE id = NEW.author_id) BEGIN
+            UPDATE books SET author_name = (SELECT name FROM authors WHERE id = NEW.author_id) WHERE id = NEW.id;
+        END""")
+        op.execute("""CREATE TRIGGER authors_propagate_name AFTER UPDATE OF name ON authors BEGIN
+            UPDATE books SET author_name = NEW.name WHERE author_id = NEW.id;
+        END""")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        for name, column in SORT_INDEXES.items():
+            op.drop_index(name, table_name='books')
+            op.create_index(name, 'books', [column, 'id'])
+
+        op.execute("DROP TRIGGER authors_propagate_name ON authors")
+        op.execute("DROP FUNCTION authors_propagate_name()")
+        op.execute("DROP TRIGGER books_set_author_name ON books")
+        op.execute("DROP FUNCTION books_set_author_name()")
+
+    elif dialect == 'sqlite':
+        op.execute("DROP TRIGGER authors_propagate_name")
+        op.execute("DROP TRIGGER books_author_name_update")
+        op.execute("DROP TRIGGER books_author_name_insert")
+
+    op.drop_column('books', 'author_name')
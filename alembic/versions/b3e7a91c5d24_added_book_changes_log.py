@@ -0,0 +1,68 @@
+"""Added book changes log
+
+Revision ID: b3e7a91c5d24
+Revises: f4c8e2b9a713
+Create Date: 2026-10-17 17:20:46.815093
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3e7a91c5d24'
+down_revision: Union[str, None] = 'f4c8e2b9a713'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TRIGGERS = {'books_record_insert': 'insert', 'books_record_update': 'update', 'books_record_delete': 'delete'}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+
+    op.create_table(
+        'book_changes',
+        sa.Column('seq', sa.Integer(), nullable=False),
+        sa.Column('book_id', sa.Integer(), nullable=False),
+        sa.Column('op', sa.String(), nullable=False),
+        sa.Column('changed_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('seq'),
+        sqlite_autoincrement=True,
+    )
+    # Seed the log with every existing book so a mirror can bootstrap from since=0
+    op.execute("INSERT INTO book_changes (book_id, op) SELECT id, 'insert' FROM books ORDER BY id")
+
+    if dialect == 'postgresql':
+        op.execute("""CREATE OR REPLACE FUNCTION books_record_changes() RETURNS trigger AS $$
+        BEGIN
+            INSERT INTO book_changes (book_id, op) SELECT id, TG_ARGV[0] FROM changed ORDER BY id;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql""")
+        for name, change in TRIGGERS.items():
+            transition = 'OLD' if change == 'delete' else 'NEW'
+            op.execute(f"""CREATE TRIGGER {name} AFTER {change.upper()} ON books
+            REFERENCING {transition} TABLE AS changed
+            FOR EACH STATEMENT EXECUTE FUNCTION books_record_changes('{change}')""")
+
+    elif dialect == 'sqlite':
+        for name, change in TRIGGERS.items():
+            row = 'OLD' if change == 'delete' else 'NEW'
+            op.execute(f"""CREATE TRIGGER {name} AFTER {change.upper()} ON books BEGIN
+                INSERT INTO book_changes (book_id, op) VALUES ({row}.id, '{change}');
+            END""")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+
+    for name in TRIGGERS:
+        op.execute(f"DROP TRIGGER {name} ON books" if dialect == 'postgresql' else f"DROP TRIGGER {name}")
+    if dialect == 'postgresql':
+        op.execute("DROP FUNCTION books_record_changes()")
+
+    op.drop_table('book_changes')
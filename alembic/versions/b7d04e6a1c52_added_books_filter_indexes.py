@@ -0,0 +1,36 @@
+"""Added books filter indexes
+
+Revision ID: b7d04e6a1c52
+Revises: 3f1c2a9d7b4e
+Create Date: 2026-10-17 10:03:17.581094
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7d04e6a1c52'
+down_revision: Union[str, None] = '3f1c2a9d7b4e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_books_genre_published_year', 'books', ['genre', 'published_year'])
+    op.create_index('ix_books_author_id_published_year', 'books', ['author_id', 'published_year'])
+
+    if op.get_bind().dialect.name == 'postgresql':
+        # LIKE 'prefix%' can only use a btree index under the C collation or with pattern ops
+        op.create_index('ix_books_title_pattern', 'books', ['title'], postgresql_ops={'title': 'text_pattern_ops'})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_books_title_pattern', table_name='books')
+
+    op.drop_index('ix_books_author_id_published_year', table_name='books')
+    op.drop_index('ix_books_genre_published_year', table_name='books')
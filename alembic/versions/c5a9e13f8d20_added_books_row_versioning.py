@@ -0,0 +1,31 @@
+"""Added books row versioning
+
+Revision ID: c5a9e13f8d20
+Revises: b7d04e6a1c52
+Create Date: 2026-10-17 11:24:05.339172
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'c5a9e13f8d20'
+down_revision: Union[str, None] = 'b7d04e6a1c52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('books') as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), nullable=False, server_default='1'))
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.func.now()))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('books') as batch_op:
+        batch_op.drop_column('updated_at')
+        batch_op.drop_column('version')
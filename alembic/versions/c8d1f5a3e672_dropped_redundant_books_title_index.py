@@ -0,0 +1,28 @@
+"""Dropped redundant books title index
+
+Revision ID: c8d1f5a3e672
+Revises: b3e7a91c5d24
+Create Date: 2026-10-17 19:05:37.524810
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8d1f5a3e672'
+down_revision: Union[str, None] = 'b3e7a91c5d24'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # ix_books_title_id (title, id) serves every lookup the single-column index did
+    op.drop_index('ix_books_title', table_name='books', if_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_books_title', 'books', ['title'])
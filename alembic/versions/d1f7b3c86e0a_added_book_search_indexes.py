@@ -0,0 +1,66 @@
+"""Added book search indexes
+
+Revision ID: d1f7b3c86e0a
+Revises: c5a9e13f8d20
+Create Date: 2026-10-17 12:48:33.017264
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'd1f7b3c86e0a'
+down_revision: Union[str, None] = 'c5a9e13f8d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute("CREATE INDEX ix_books_title_trgm ON books USING gin (title gin_trgm_ops)")
+        op.execute("CREATE INDEX ix_authors_name_trgm ON authors USING gin (name gin_trgm_ops)")
+
+    elif dialect == 'sqlite':
+        op.execute("CREATE VIRTUAL TABLE books_search USING fts5(title, author, tokenize='trigram')")
+        op.execute("""
+            INSERT INTO books_search (rowid, title, author)
+            SELECT books.id, books.title, authors.name FROM books JOIN authors ON authors.id = books.author_id
+        """)
+        op.execute("""CREATE TRIGGER books_search_insert AFTER INSERT ON books BEGIN
+            INSERT INTO books_search (rowid, title, author)
+            SELECT NEW.id, NEW.title, authors.name FROM authors WHERE authors.id = NEW.author_id;
+        END""")
+        op.execute("""CREATE TRIGGER books_search_update AFTER UPDATE OF title, author_id ON books BEGIN
+            DELETE FROM books_search WHERE rowid = OLD.id;
+            INSERT INTO books_search (rowid, title, author)
+            SELECT NEW.id, NEW.title, authors.name FROM authors WHERE authors.id = NEW.author_id;
+        END""")
+        op.execute("""CREATE TRIGGER books_search_delete AFTER DELETE ON books BEGIN
+            DELETE FROM books_search WHERE rowid = OLD.id;
+        END""")
+        op.execute("""CREATE TRIGGER books_search_author_rename AFTER UPDATE OF name ON authors BEGIN
+            UPDATE books_search SET author = NEW.name
+            WHERE rowid IN (SELECT id FROM books WHERE author_id = NEW.id);
+        END""")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        op.execute("DROP INDEX ix_authors_name_trgm")
+        op.execute("DROP INDEX ix_books_title_trgm")
+
+    elif dialect == 'sqlite':
+        op.execute("DROP TRIGGER books_search_author_rename")
+        op.execute("DROP TRIGGER books_search_delete")
+        op.execute("DROP TRIGGER books_search_update")
+        op.execute("DROP TRIGGER books_search_insert")
+        op.execute("DROP TABLE books_search")
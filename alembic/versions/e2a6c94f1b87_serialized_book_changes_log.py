@@ -0,0 +1,39 @@
+"""Serialized book changes log
+
+Revision ID: e2a6c94f1b87
+Revises: c8d1f5a3e672
+Create Date: 2026-10-17 21:12:08.331946
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a6c94f1b87'
+down_revision: Union[str, None] = 'c8d1f5a3e672'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def record_changes(lock: str) -> str:
+    return f"""CREATE OR REPLACE FUNCTION books_record_changes() RETURNS trigger AS $$
+        BEGIN{lock}
+            INSERT INTO book_changes (book_id, op) SELECT id, TG_ARGV[0] FROM changed ORDER BY id;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Sequence numbers follow commit order once writers serialize on this lock; SQLite needs no change
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(record_changes("\n            PERFORM pg_advisory_xact_lock(1651469163);"))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(record_changes(""))
@@ -0,0 +1,32 @@
+"""Added books natural key
+
+Revision ID: f4c8e2b9a713
+Revises: a9e2c47d1b35
+Create Date: 2026-10-17 16:42:18.207531
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4c8e2b9a713'
+down_revision: Union[str, None] = 'a9e2c47d1b35'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Earlier re-imports left duplicate copies behind; keep the oldest row of each before enforcing uniqueness
+    op.execute("""
+        DELETE FROM books
+        WHERE id NOT IN (SELECT MIN(id) FROM books GROUP BY title, author_id, published_year)
+    """)
+    op.create_index('ux_books_natural_key', 'books', ['title', 'author_id', 'published_year'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ux_books_natural_key', table_name='books')
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+from app.core.config import settings
+
+
+class LRUCache:
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                del self._entries[key]
+                self.misses += 1
+                return default
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, expires_at: Optional[float] = None):
+        if self.maxsize <= 0:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        if ttl is not None:
+            expires_at = min(expires_at, time.time() + ttl) if expires_at is not None else time.time() + ttl
+
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+class CacheBackend:
+    async def get(self, key: str) -> Any:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        raise NotImplementedError
+
+    async def delete(self, *keys: str):
+        raise NotImplementedError
+
+    async def incr(self, key: str) -> int:
+        raise NotImplementedError
+
+    async def clear(self):
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        return {}
+
+
+class MemoryCacheBackend(CacheBackend):
+    def __init__(self, maxsize: int, ttl: Optional[float] = None):
+        self._entries = LRUCache(maxsize, ttl)
+        self._counters = {}
+
+    async def get(self, key: str) -> Any:
+        if key in self._counters:
+            return self._counters[key]
+        return self._entries.get(key)
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        self._entries.set(key, value, ttl=ttl)
+
+    async def delete(self, *keys: str):
+        for key in keys:
+            self._entries.delete(key)
+
+    async def incr(self, key: str) -> int:
+        self._counters[key] = self._counters.get(key, 0) + 1
+        return self._counters[key]
+
+    async def clear(self):
+        self._entries.clear()
+        self._counters.clear()
+
+    def stats(self) -> dict:
+        return self._entries.stats()
+
+
+class BookCache:
+    GENERATION_KEY = "books:generation"
+    LISTINGS_WRITTEN_KEY = "written:books"
+
+    def __init__(self, backend: CacheBackend, enabled: bool = True, replica_lag: float = 0):
+        self.backend = backend
+        self.enabled = enabled
+        self.replica_lag = replica_lag
+        self.hits = 0
+        self.misses = 0
+
+    async def _read_through(self, key: str, loader: Callable[[], Awaitable[Any]], written_key: str) -> Any:
+        if not self.enabled:
+            return await loader()
+
+        value = await self.backend.get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        self.misses += 1
+        value = await loader()
+        # Loaders read from the replica, which may not have caught up with a recent write yet
+        if not self.replica_lag or not await self.backend.get(written_key):
+            await self.backend.set(key, value)
+        return value
+
+    async def get_book(self, book_id: int, loader: Callable[[], Awaitable[Any]]) -> Any:
+        return await self._read_through(f"book:{book_id}", loader, f"written:book:{book_id}")
+
+    async def get_books(self, params: dict, loader: Callable[[], Awaitable[Any]]) -> Any:
+        generation = await self.backend.get(self.GENERATION_KEY) or 0
+        digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()
+        return await self._read_through(f"books:{generation}:{digest}", loader, self.LISTINGS_WRITTEN_KEY)
+
+    async def invalidate_books(self, *book_ids: int):
+        if book_ids:
+            if self.replica_lag:
+                for book_id in book_ids:
+                    await self.backend.set(f"written:book:{book_id}", True, ttl=self.replica_lag)
+            await self.backend.delete(*(f"book:{book_id}" for book_id in book_ids))
+        await self.invalidate_listings()
+
+    async def invalidate_listings(self):
+        if self.replica_lag:
+            await self.backend.set(self.LISTINGS_WRITTEN_KEY, True, ttl=self.replica_lag)
+        await self.backend.incr(self.GENERATION_KEY)
+
+    async def clear(self):
+        await self.backend.clear()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, **{
+            f"backend_{key}": value for key, value in self.backend.stats().items()
+        }}
+
+
+book_cache = BookCache(
+    MemoryCacheBackend(settings.BOOK_CACHE_SIZE, settings.BOOK_CACHE_TTL),
+    enabled=settings.BOOK_CACHE_ENABLED,
+    replica_lag=settings.DB_REPLICA_MAX_LAG if settings.DATABASE_READ_URL else 0
+)
+
+# Authors are never renamed or deleted, so a name maps to the same id in every worker
+author_cache = LRUCache(settings.AUTHOR_CACHE_SIZE, settings.AUTHOR_CACHE_TTL)
+count_cache = LRUCache(settings.COUNT_CACHE_SIZE, settings.COUNT_CACHE_TTL)
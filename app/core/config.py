@@ -1,5 +1,5 @@
 import os
-from typing import ClassVar, List
+from typing import ClassVar, List, Optional
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
 
@@ -7,14 +7,62 @@ load_dotenv()
 
 
 class Settings(BaseSettings):
-    DATABASE_URL: str = os.getenv("DATABASE_URL")
-    if not DATABASE_URL:
-        raise ValueError("DATABASE_URL must be set")
+    DATABASE_URL: Optional[str] = os.getenv("DATABASE_URL")
+    DATABASE_READ_URL: Optional[str] = os.getenv("DATABASE_READ_URL")
+    DB_REPLICA_MAX_LAG: int = 5
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_PREWARM: bool = True
+    DB_MAX_CONNECTIONS: Optional[int] = None
+    DB_SCHEMA_MODE: str = os.getenv("DB_SCHEMA_MODE", "create")
+    DB_SCHEMA_REVISION: Optional[str] = os.getenv("DB_SCHEMA_REVISION")
+    WEB_CONCURRENCY: Optional[int] = None
+    SERVER_HOST: str = os.getenv("SERVER_HOST", "0.0.0.0")
+    SERVER_PORT: int = int(os.getenv("SERVER_PORT", "8000"))
+    SERVER_GRACEFUL_TIMEOUT: int = 30
+    SLOW_QUERY_MS: int = 200
+    SLOW_REQUEST_MS: int = 1000
     SECRET_KEY: str = os.getenv("SECRET_KEY", "key")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    TOKEN_CACHE_SIZE: int = 10000
+    TOKEN_CACHE_TTL: int = 300
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_QUEUE: int = 100
+
+    QUERY_REGISTRY_SIZE: int = 1000
+    QUERY_CACHE_SIZE: int = 1000
+    DB_STATEMENT_CACHE_SIZE: int = 500
+
+    BOOKS_DENORMALIZED_READS: bool = True
 
     PAGE_SIZE: int = 10
+    BATCH_MAX_SIZE: int = 1000
+    EXPORT_BATCH_SIZE: int = 1000
+    CHANGE_LOG_COMPACT_INTERVAL: int = 3600
+    SEARCH_MAX_RESULTS: int = 100
+    AUTHOR_BOOKS_LIMIT: int = 100
+    FACET_LIMIT: int = 20
+    COUNT_CACHE_SIZE: int = 1000
+    COUNT_CACHE_TTL: int = 300
+
+    BOOK_CACHE_ENABLED: bool = True
+    BOOK_CACHE_SIZE: int = 10000
+    BOOK_CACHE_TTL: int = 60
+    BOOK_CACHE_SYNC_INTERVAL: float = 1.0
+    AUTHOR_CACHE_SIZE: int = 10000
+    AUTHOR_CACHE_TTL: int = 3600
+
+    IMPORT_CHUNK_SIZE: int = 1000
+    IMPORT_COMMIT_EVERY: int = 10000
+    IMPORT_MAX_REPORTED_ERRORS: int = 100
+    JOB_WORKERS: int = 2
+    JOB_QUEUE_SIZE: int = 100
+    JOB_HISTORY_SIZE: int = 1000
+    JOB_STATE_DIR: Optional[str] = None
     SUPPORTED_GENRES: ClassVar[List[str]] = [
         "Fiction", "Non-Fiction", "Science", "History", "Mystery", "Fantasy"
     ]
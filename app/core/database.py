@@ -1,18 +1,190 @@
+import asyncio
+import os
+import time
+from functools import lru_cache
+from sqlalchemy import event, text
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from app.core import metrics
 from app.core.config import settings
 import logging
 
-engine = create_async_engine(settings.DATABASE_URL, pool_pre_ping=True, future=True, pool_size=10, max_overflow=20)
-AsyncSessionLocal = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+logger = logging.getLogger(__name__)
+
+SCHEMA_MODES = ("create", "check", "none")
+ALEMBIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "alembic")
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.record_pool_checkout(getattr(self, "logging_name", None) or "default", elapsed)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    metrics.record_query(elapsed)
+    if elapsed * 1000 >= settings.SLOW_QUERY_MS:
+        metrics.slow_queries.inc()
+        logger.warning("Slow query (%.1f ms): %s", elapsed * 1000, " ".join(statement.split())[:1000])
+
+
+def instrument_engine(engine):
+    event.listen(engine.sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine.sync_engine, "after_cursor_execute", _after_cursor_execute)
+    return engine
+
+
+def pool_limits() -> tuple:
+    pool_size, max_overflow = settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW
+    if settings.DB_MAX_CONNECTIONS:
+        # The connection budget is shared by every worker process talking to the same server. A worker cannot
+        # see how many siblings "uvicorn --workers N" started, so the count has to be given explicitly.
+        if not settings.WEB_CONCURRENCY:
+            raise ValueError("DB_MAX_CONNECTIONS requires WEB_CONCURRENCY to be set to the number of workers")
+        per_worker = settings.DB_MAX_CONNECTIONS // settings.WEB_CONCURRENCY
+        if per_worker < 1:
+            raise ValueError("DB_MAX_CONNECTIONS must allow at least one connection per worker")
+        pool_size = min(pool_size, per_worker)
+        max_overflow = min(max_overflow, per_worker - pool_size)
+    return pool_size, max_overflow
+
+
+def build_engine(url: str, name: str = "primary"):
+    if not url:
+        raise ValueError("DATABASE_URL must be set")
+    options = {
+        "future": True, "pool_pre_ping": settings.DB_POOL_PRE_PING, "query_cache_size": settings.QUERY_CACHE_SIZE
+    }
+    if url.startswith("postgresql+asyncpg"):
+        # Server-side prepared statements are cached per connection, keyed by the SQL text
+        options["connect_args"] = {"prepared_statement_cache_size": settings.DB_STATEMENT_CACHE_SIZE}
+    if not url.startswith("sqlite"):
+        pool_size, max_overflow = pool_limits()
+        options.update(poolclass=TimedQueuePool, pool_logging_name=name, pool_size=pool_size,
+                       max_overflow=max_overflow, pool_recycle=settings.DB_POOL_RECYCLE,
+                       pool_timeout=settings.DB_POOL_TIMEOUT)
+    return instrument_engine(create_async_engine(url, **options))
+
+
 Base = declarative_base()
 
+# Engines are created on first use so importing the app (models, Alembic, tests) does not need DATABASE_URL
+_engines = {}
+
+
+def get_engine():
+    if "primary" not in _engines:
+        _engines["primary"] = build_engine(settings.DATABASE_URL)
+    return _engines["primary"]
+
+
+def get_read_engine():
+    if "replica" not in _engines:
+        _engines["replica"] = (
+            build_engine(settings.DATABASE_READ_URL, "replica") if settings.DATABASE_READ_URL else get_engine()
+        )
+    return _engines["replica"]
+
+
+def created_engines() -> dict:
+    return dict(_engines)
 
-async def init_db():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+
+@lru_cache(maxsize=None)
+def _session_factory(engine):
+    return sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+
+def pool_stats(engine) -> dict:
+    pool = engine.pool
+    if not isinstance(pool, AsyncAdaptedQueuePool):
+        return {}
+    return {"size": pool.size(), "checked_out": pool.checkedout(), "overflow": pool.overflow()}
+
+
+async def warm_pool(engine) -> int:
+    pool = engine.pool
+    if not isinstance(pool, AsyncAdaptedQueuePool):
+        return 0
+    # Opening the whole pool at once moves connection setup out of the first requests after a (re)start
+    connections = [engine.connect() for _ in range(pool.size())]
+    results = await asyncio.gather(*(connection.start() for connection in connections), return_exceptions=True)
+    opened = [connection for connection, result in zip(connections, results) if not isinstance(result, Exception)]
+    await asyncio.gather(*(connection.close() for connection in opened))
+    if len(opened) < len(connections):
+        error = next(result for result in results if isinstance(result, Exception))
+        logger.warning("Pre-warmed %d of %d connections for pool %s: %s", len(opened), len(connections),
+                       getattr(pool, "logging_name", None) or "default", error)
+    return len(opened)
+
+
+async def dispose_engines():
+    for engine in set(_engines.values()):
+        await engine.dispose()
+    _engines.clear()
+    _session_factory.cache_clear()
+
+
+@lru_cache(maxsize=None)
+def alembic_heads() -> frozenset:
+    if settings.DB_SCHEMA_REVISION:
+        return frozenset([settings.DB_SCHEMA_REVISION])
+    # Importing Alembic costs more than the check itself, so deployments can pin DB_SCHEMA_REVISION instead
+    from alembic.script import ScriptDirectory
+    return frozenset(ScriptDirectory(ALEMBIC_DIR).get_heads())
+
+
+async def check_schema(engine) -> str:
+    try:
+        async with engine.connect() as conn:
+            revisions = set((await conn.execute(text("SELECT version_num FROM alembic_version"))).scalars())
+    except DBAPIError:
+        raise RuntimeError("Database schema is not managed by Alembic; run 'alembic upgrade head'")
+
+    if revisions != alembic_heads():
+        raise RuntimeError(
+            f"Database schema is at revision {', '.join(sorted(revisions)) or 'none'} but the code expects "
+            f"{', '.join(sorted(alembic_heads()))}; run 'alembic upgrade head'"
+        )
+    return next(iter(revisions))
+
+
+async def init_db(mode: str = settings.DB_SCHEMA_MODE):
+    if mode == "create":
+        # Importing the models registers their tables on Base.metadata
+        from app.models import author, book, user
+        async with get_engine().begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    elif mode == "check":
+        await check_schema(get_engine())
+    elif mode != "none":
+        raise ValueError(f"DB_SCHEMA_MODE must be one of {', '.join(SCHEMA_MODES)}")
 
 
 async def get_db():
-    async with AsyncSessionLocal() as session:
+    async with get_session_factory()() as session:
+        yield session
+
+
+async def get_read_db():
+    async with get_read_session_factory()() as session:
         yield session
+
+
+def get_session_factory():
+    return _session_factory(get_engine())
+
+
+def get_read_session_factory():
+    return _session_factory(get_read_engine())
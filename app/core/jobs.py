@@ -0,0 +1,329 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import stat
+import tempfile
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from fastapi import HTTPException, status
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    def __init__(self, kind: str, payload: dict, owner: Optional[str] = None, job_id: Optional[str] = None):
+        self.id = job_id or uuid.uuid4().hex
+        self.kind = kind
+        self.payload = payload
+        self.owner = owner
+        self.status = "queued"
+        self.progress: dict = {}
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now(timezone.utc)
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+        self._done = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in {"succeeded", "failed"}
+
+    def throughput(self) -> Optional[float]:
+        if self._started is None or "processed" not in self.progress:
+            return None
+        elapsed = (self._finished or time.monotonic()) - self._started
+        return round(self.progress["processed"] / elapsed, 1) if elapsed > 0 else None
+
+    def mark_running(self):
+        self.status = "running"
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.monotonic()
+
+    def mark_finished(self, result: Any = None, error: Optional[str] = None):
+        self.status = "failed" if error else "succeeded"
+        self.result = result
+        self.error = error
+        self.finished_at = datetime.now(timezone.utc)
+        self._finished = time.monotonic()
+        self._done.set()
+
+    async def wait(self):
+        await self._done.wait()
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "progress": self.progress,
+            "rows_per_second": self.throughput(),
+            "result": self.result,
+            "error": self.error,
+        }
+
+
+class JobQueue:
+    async def enqueue(self, job: Job):
+        raise NotImplementedError
+
+    async def dequeue(self) -> Job:
+        raise NotImplementedError
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        raise NotImplementedError
+
+    async def save(self, job: Job):
+        raise NotImplementedError
+
+    async def close(self) -> List[Job]:
+        return []
+
+    def stats(self) -> dict:
+        return {}
+
+
+class MemoryJobQueue(JobQueue):
+    def __init__(self, max_queued: int, history_size: int):
+        self.max_queued = max_queued
+        self.history_size = history_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+
+    @property
+    def queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue(self.max_queued)
+        return self._queue
+
+    async def enqueue(self, job: Job):
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many queued jobs",
+                headers={"Retry-After": "5"},
+            )
+        await self.save(job)
+
+    async def dequeue(self) -> Job:
+        return await self.queue.get()
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    async def save(self, job: Job):
+        self._jobs[job.id] = job
+        self._jobs.move_to_end(job.id)
+        # Only finished jobs are forgotten; queued and running ones are always reachable
+        while len(self._jobs) > self.history_size:
+            oldest = next((key for key, value in self._jobs.items() if value.finished), None)
+            if oldest is None:
+                break
+            self._forget(oldest)
+
+    def _forget(self, job_id: str):
+        del self._jobs[job_id]
+
+    async def close(self) -> List[Job]:
+        # Jobs still waiting in an in-memory queue cannot outlive the process
+        discarded = []
+        while self._queue is not None and not self._queue.empty():
+            job = self._queue.get_nowait()
+            job.mark_finished(error="Job was cancelled because the server shut down")
+            discarded.append(job)
+        self._queue = None
+        return discarded
+
+    def stats(self) -> dict:
+        counts = {"queued": 0, "running": 0, "succeeded": 0, "failed": 0}
+        for job in self._jobs.values():
+            counts[job.status] += 1
+        return counts
+
+
+class StoredJob:
+    def __init__(self, state: dict):
+        self.owner = state.pop("owner")
+        self.state = state
+
+    def to_dict(self) -> dict:
+        return self.state
+
+
+class SharedJobQueue(MemoryJobQueue):
+    JOB_ID = re.compile(r"[0-9a-f]{32}")
+
+    def __init__(self, max_queued: int, history_size: int, state_dir: str):
+        super().__init__(max_queued, history_size)
+        self.state_dir = state_dir
+        self._checked = False
+
+    def _check_state_dir(self):
+        if self._checked:
+            return
+        os.makedirs(self.state_dir, mode=0o700, exist_ok=True)
+        # get() trusts the owner recorded in these files, so nobody else may be able to write or swap them
+        info = os.lstat(self.state_dir)
+        if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or info.st_mode & 0o077:
+            raise RuntimeError(f"JOB_STATE_DIR {self.state_dir} must be a directory owned by the server user "
+                               f"and not accessible to anyone else")
+        self._checked = True
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.state_dir, f"{job_id}.json")
+
+    async def get(self, job_id: str):
+        job = await super().get(job_id)
+        if job is not None or not self.JOB_ID.fullmatch(job_id):
+            return job
+        # Jobs run in the worker that accepted them; the others only see the state it last published
+        self._check_state_dir()
+        try:
+            with open(os.open(self._path(job_id), os.O_RDONLY | os.O_NOFOLLOW)) as state_file:
+                return StoredJob(json.load(state_file))
+        except (OSError, ValueError):
+            return None
+
+    async def save(self, job: Job):
+        await super().save(job)
+        self._check_state_dir()
+        descriptor, temporary = tempfile.mkstemp(suffix=".tmp", dir=self.state_dir)
+        try:
+            with open(descriptor, "w") as state_file:
+                json.dump({**job.to_dict(), "owner": job.owner}, state_file, default=str)
+            os.replace(temporary, self._path(job.id))
+        except BaseException:
+            os.remove(temporary)
+            raise
+
+    def _forget(self, job_id: str):
+        super()._forget(job_id)
+        try:
+            os.remove(self._path(job_id))
+        except FileNotFoundError:
+            pass
+
+
+class JobRunner:
+    def __init__(self, queue: JobQueue, workers: int):
+        self.queue = queue
+        self.workers = workers
+        self.handlers: Dict[str, Callable[[Job], Awaitable[Any]]] = {}
+        self.cleanups: Dict[str, Callable[[Job], Any]] = {}
+        self._tasks = []
+        self._running: Dict[str, Job] = {}
+        self._stopping = False
+
+    def register(self, kind: str, handler: Callable[[Job], Awaitable[Any]],
+                 cleanup: Optional[Callable[[Job], Any]] = None):
+        self.handlers[kind] = handler
+        if cleanup:
+            self.cleanups[kind] = cleanup
+
+    def _cleanup(self, job: Job):
+        cleanup = self.cleanups.get(job.kind)
+        if cleanup:
+            try:
+                cleanup(job)
+            except Exception:
+                logger.exception("Cleanup of job %s (%s) failed", job.id, job.kind)
+
+    def start(self):
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._work(), name=f"job-worker-{index}")
+                           for index in range(self.workers)]
+
+    async def stop(self, timeout: float = 0):
+        # New submissions are refused and queued jobs dropped first, so idle workers cannot pick anything up
+        self._stopping = True
+        try:
+            for job in await self.queue.close():
+                self._cleanup(job)
+                await self.queue.save(job)
+
+            running = [job.wait() for job in self._running.values()]
+            if running and timeout > 0:
+                # Imports commit chunk by chunk, so a running job gets the grace period to finish its file
+                await asyncio.wait([asyncio.ensure_future(waiter) for waiter in running], timeout=timeout)
+
+            tasks, self._tasks = self._tasks, []
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            self._stopping = False
+
+    async def submit(self, kind: str, payload: dict, owner: Optional[str] = None) -> Job:
+        if kind not in self.handlers:
+            raise ValueError(f"No handler registered for job kind '{kind}'")
+        if self._stopping:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is shutting down",
+                headers={"Retry-After": "5"},
+            )
+        job = Job(kind, payload, owner)
+        await self.queue.enqueue(job)
+        # Workers are started on first use so importing the app never needs a running event loop
+        self.start()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        return await self.queue.get(job_id)
+
+    async def report_progress(self, job: Job, progress: dict):
+        job.progress = progress
+        await self.queue.save(job)
+
+    async def _work(self):
+        while True:
+            job = await self.queue.dequeue()
+            job.mark_running()
+            self._running[job.id] = job
+            await self.queue.save(job)
+            try:
+                result = await self.handlers[job.kind](job)
+            except asyncio.CancelledError:
+                job.mark_finished(error="Job was cancelled because the server shut down")
+                await self.queue.save(job)
+                raise
+            except HTTPException as e:
+                job.mark_finished(error=str(e.detail))
+            except Exception as e:
+                logger.exception("Job %s (%s) failed", job.id, job.kind)
+                job.mark_finished(error=str(e) or e.__class__.__name__)
+            else:
+                job.mark_finished(result=result)
+            finally:
+                self._running.pop(job.id, None)
+                self._cleanup(job)
+            await self.queue.save(job)
+
+    def stats(self) -> dict:
+        return {"workers": len(self._tasks), **self.queue.stats()}
+
+
+def build_job_queue() -> JobQueue:
+    state_dir = settings.JOB_STATE_DIR
+    if not state_dir and (settings.WEB_CONCURRENCY or 1) > 1:
+        # GET /jobs/{id} may land on any worker, so job state has to be readable by all of them
+        state_dir = os.path.join(tempfile.gettempdir(), f"book-jobs-{os.getuid()}")
+    if state_dir:
+        return SharedJobQueue(settings.JOB_QUEUE_SIZE, settings.JOB_HISTORY_SIZE, state_dir)
+    return MemoryJobQueue(settings.JOB_QUEUE_SIZE, settings.JOB_HISTORY_SIZE)
+
+
+job_runner = JobRunner(build_job_queue(), settings.JOB_WORKERS)
@@ -0,0 +1,173 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+from starlette.datastructures import MutableHeaders
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+COUNTER_STATS = {"hits", "misses", "evictions", "completed", "rejected", "backend_hits", "backend_misses",
+                 "backend_evictions"}
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], **extra: str) -> str:
+    pairs = list(zip(names, values)) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._series: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        with self._lock:
+            series = self._series.setdefault(labels, [[0] * (len(self.buckets) + 1), 0.0])
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + (float("inf"),), counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else f"{bound:g}"
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le=le)} {cumulative}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {total:g}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+def render_stats(name: str, stats: dict) -> List[str]:
+    lines = []
+    for key, value in sorted(stats.items()):
+        if value is None:
+            continue
+        counter = key in COUNTER_STATS
+        metric = f"{name}_{key}_total" if counter else f"{name}_{key}"
+        lines += [f"# TYPE {metric} {'counter' if counter else 'gauge'}", f"{metric} {value:g}"]
+    return lines
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.pool_wait = 0.0
+
+    def server_timing(self, total: float) -> str:
+        return (f'app;dur={total * 1000:.1f}, db;dur={self.sql_time * 1000:.1f};desc="{self.queries} queries", '
+                f"pool;dur={self.pool_wait * 1000:.1f}")
+
+
+# SQLAlchemy runs engine events inside greenlets spawned from the request task, which share its context
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+request_duration = Histogram("http_request_duration_seconds", "HTTP request latency", ("method", "route", "status"))
+request_queries = Histogram("http_request_db_queries", "SQL statements executed per HTTP request", ("route",),
+                            QUERY_COUNT_BUCKETS)
+request_sql_time = Histogram("http_request_db_seconds", "Cumulative SQL time per HTTP request", ("route",))
+query_duration = Histogram("db_query_duration_seconds", "SQL statement execution time")
+pool_checkout = Histogram("db_pool_checkout_seconds", "Time spent waiting for a pooled connection", ("engine",))
+slow_queries = Counter("db_slow_queries_total", "SQL statements slower than SLOW_QUERY_MS")
+slow_requests = Counter("http_slow_requests_total", "HTTP requests slower than SLOW_REQUEST_MS", ("route",))
+
+# Filled in once by the application lifespan and rendered as app_startup_* gauges
+startup_timings: Dict[str, float] = {}
+
+METRICS = [request_duration, request_queries, request_sql_time, query_duration, pool_checkout, slow_queries,
+           slow_requests]
+
+
+def record_query(elapsed: float):
+    query_duration.observe(elapsed)
+    stats = request_stats.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.sql_time += elapsed
+
+
+def record_pool_checkout(engine_name: str, elapsed: float):
+    pool_checkout.observe(elapsed, engine_name)
+    stats = request_stats.get()
+    if stats is not None:
+        stats.pool_wait += elapsed
+
+
+def render() -> str:
+    return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
+
+
+class MetricsMiddleware:
+    def __init__(self, app, slow_request_ms: Optional[float] = None, logger=None):
+        self.app = app
+        self.slow_request_ms = slow_request_ms
+        self.logger = logger
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                # Streaming bodies keep querying after this point; their SQL only reaches the histograms
+                server_timing = stats.server_timing(time.perf_counter() - started)
+                MutableHeaders(scope=message).append("Server-Timing", server_timing)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_stats.reset(token)
+            elapsed = time.perf_counter() - started
+            route = scope["route"].path if "route" in scope else "unmatched"
+            request_duration.observe(elapsed, scope["method"], route, str(status))
+            request_queries.observe(stats.queries, route)
+            request_sql_time.observe(stats.sql_time, route)
+            if self.slow_request_ms is not None and elapsed * 1000 >= self.slow_request_ms:
+                slow_requests.inc(route)
+                if self.logger:
+                    self.logger.warning("Slow request %s %s: %.1f ms, %d queries, %.1f ms SQL", scope["method"],
+                                        scope["path"], elapsed * 1000, stats.queries, stats.sql_time * 1000)
@@ -1,16 +1,13 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.security import decode_access_token
-from app.core.database import get_db
-from app.crud.raw_sql_crud import get_book_by_id
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
 
 class Permissions:
     @staticmethod
-    async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    async def get_current_user(token: str = Depends(oauth2_scheme)):
         payload = decode_access_token(token)
         username = payload.get("sub")
         if not username:
@@ -21,5 +18,5 @@ class Permissions:
         return username
 
     @staticmethod
-    async def is_authenticated(current_user: str = Depends(get_current_user)):
+    async def is_authenticated(current_user: str = Depends(get_current_user.__func__)):
         return current_user
@@ -0,0 +1,157 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import IO, AsyncIterator, Iterator
+from fastapi import HTTPException
+
+READ_BLOCK_SIZE = 64 * 1024
+MAX_JSON_ITEM_SIZE = 1024 * 1024
+
+EXPORT_CHUNK_ROWS = 500
+CSV_EXPORT_FIELDS = ["id", "title", "genre", "published_year", "author_id", "author"]
+
+FILE_FORMATS = {".json": "json", ".ndjson": "ndjson", ".jsonl": "ndjson", ".csv": "csv"}
+
+
+def detect_format(filename: str) -> str:
+    for extension, file_format in FILE_FORMATS.items():
+        if filename and filename.lower().endswith(extension):
+            return file_format
+    raise HTTPException(status_code=400, detail="Unsupported file format")
+
+
+def iter_json_array(stream: IO[str], block_size: int = READ_BLOCK_SIZE,
+                    max_item_size: int = MAX_JSON_ITEM_SIZE) -> Iterator[dict]:
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+    started, expect_value = False, True
+
+    while True:
+        while pos < len(buffer) and buffer[pos].isspace():
+            pos += 1
+
+        if pos == len(buffer):
+            if eof:
+                raise HTTPException(status_code=400, detail="Malformed JSON file: unexpected end of file")
+            chunk = stream.read(block_size)
+            buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+            continue
+
+        char = buffer[pos]
+        if not started:
+            if char != "[":
+                raise HTTPException(status_code=400, detail="Malformed JSON file: expected a list of books")
+            started, pos = True, pos + 1
+            continue
+
+        if char == "]":
+            return
+
+        if not expect_value:
+            if char != ",":
+                raise HTTPException(status_code=400, detail="Malformed JSON file: expected ',' between books")
+            expect_value, pos = True, pos + 1
+            continue
+
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            end = None
+
+        if end is None or (end == len(buffer) and not eof):
+            if eof:
+                raise HTTPException(status_code=400, detail="Malformed JSON file")
+            # A book that still does not decode after this much input is malformed, not truncated
+            if len(buffer) - pos >= max_item_size:
+                detail = f"Malformed JSON file: invalid book or one larger than {max_item_size} bytes"
+                raise HTTPException(status_code=400, detail=detail)
+            chunk = stream.read(block_size)
+            buffer, pos, eof = buffer[pos:] + chunk, 0, not chunk
+            continue
+
+        yield item
+        pos, expect_value = end, False
+
+
+def iter_ndjson(stream: IO[str]) -> Iterator[dict]:
+    for line in stream:
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                yield None
+
+
+def iter_book_rows(stream: IO[str], file_format: str) -> Iterator[dict]:
+    if file_format == "json":
+        return iter_json_array(stream)
+    if file_format == "ndjson":
+        return iter_ndjson(stream)
+    if file_format == "csv":
+        return iter(csv.DictReader(stream))
+    raise HTTPException(status_code=400, detail="Unsupported file format")
+
+
+async def encode_ndjson(books: AsyncIterator[dict], chunk_rows: int = EXPORT_CHUNK_ROWS) -> AsyncIterator[str]:
+    lines = []
+    async for book in books:
+        lines.append(json.dumps({
+            "id": book["id"],
+            "title": book["title"],
+            "genre": book["genre"],
+            "published_year": book["published_year"],
+            "author": {"id": book["author_id"], "name": book["author_name"]}
+        }, ensure_ascii=False))
+        if len(lines) >= chunk_rows:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+async def encode_csv(books: AsyncIterator[dict], chunk_rows: int = EXPORT_CHUNK_ROWS) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_EXPORT_FIELDS)
+    rows = 0
+    async for book in books:
+        writer.writerow([book["id"], book["title"], book["genre"], book["published_year"], book["author_id"],
+                         book["author_name"]])
+        rows += 1
+        if rows >= chunk_rows:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    yield buffer.getvalue()
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {value.__class__.__name__} is not JSON serializable")
+
+
+async def encode_changes(changes: AsyncIterator[dict], chunk_rows: int = EXPORT_CHUNK_ROWS) -> AsyncIterator[str]:
+    lines = []
+    async for change in changes:
+        if change["id"] is None:
+            line = {"seq": change["seq"], "op": "delete", "id": change["book_id"]}
+        else:
+            line = {"seq": change["seq"], "op": "upsert", "id": change["book_id"], "book": {
+                "id": change["id"],
+                "title": change["title"],
+                "genre": change["genre"],
+                "published_year": change["published_year"],
+                "author": {"id": change["author_id"], "name": change["author_name"]},
+                "version": change["version"],
+                "updated_at": change["updated_at"]
+            }}
+        lines.append(json.dumps(line, ensure_ascii=False, default=_json_default))
+        if len(lines) >= chunk_rows:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
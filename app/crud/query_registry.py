@@ -0,0 +1,27 @@
+from typing import Callable, Hashable, Sequence, Union
+from sqlalchemy import TextClause, bindparam, text
+from app.core.cache import LRUCache
+from app.core.config import settings
+
+
+class QueryRegistry:
+    def __init__(self, maxsize: int):
+        self._statements = LRUCache(maxsize)
+
+    def text(self, key: Hashable, sql: Union[str, Callable[[], str]], expanding: Sequence[str] = ()) -> TextClause:
+        statement = self._statements.get(key)
+        if statement is None:
+            statement = text(sql() if callable(sql) else sql)
+            if expanding:
+                statement = statement.bindparams(*(bindparam(param, expanding=True) for param in expanding))
+            self._statements.set(key, statement)
+        return statement
+
+    def clear(self):
+        self._statements.clear()
+
+    def stats(self) -> dict:
+        return self._statements.stats()
+
+
+queries = QueryRegistry(settings.QUERY_REGISTRY_SIZE)
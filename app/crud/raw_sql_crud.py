@@ -1,27 +1,60 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
 from fastapi import HTTPException
-from app.schemas.book import BookCreate, BookUpdate
+from typing import IO, Any, Callable, List, Optional, Union
+from app.schemas.book import BookCreate, BookUpdate, BookBatchUpdate
+from app.core.cache import author_cache, book_cache, count_cache
 from app.core.config import settings
+from app.crud.book_io import detect_format, iter_book_rows
+from app.crud.query_registry import queries
+import base64
+import inspect
 import json
-import csv
+
+BOOK_COLUMNS = (
+    "books.id, books.title, books.genre, books.published_year, books.author_id, books.version, books.updated_at"
+)
+# Columns of ux_books_natural_key: a book is identified by its title, author and year of publication
+NATURAL_KEY = "title, author_id, published_year"
+DUPLICATE_BOOK_DETAIL = "A book with the same title, author and published year already exists"
+
+IMPORT_MODES = ("insert", "upsert")
+IMPORT_VALUES_ROWS = 250
+
+
+def _author_name_source():
+    # books.author_name is kept in sync by triggers, so denormalized reads can skip the authors JOIN
+    if settings.BOOKS_DENORMALIZED_READS:
+        return "books.author_name", ""
+    return "authors.name", "\n    JOIN authors ON books.author_id = authors.id"
 
 
 async def validate_or_create_author(db: AsyncSession, author_name: str):
     if not author_name or not author_name.strip():
         raise HTTPException(status_code=400, detail="Author name cannot be empty")
 
-    query_author = text("SELECT id FROM authors WHERE name = :author_name")
+    author_id = author_cache.get(author_name)
+    if author_id is not None:
+        return author_id
+
+    query_author = queries.text("select_author_id", "SELECT id FROM authors WHERE name = :author_name")
     result = await db.execute(query_author, {"author_name": author_name})
     author = result.fetchone()
 
     if not author:
-        query_insert_author = text("INSERT INTO authors (name) VALUES (:author_name) RETURNING id")
+        query_insert_author = queries.text("insert_author", """
+            INSERT INTO authors (name) VALUES (:author_name) ON CONFLICT (name) DO NOTHING RETURNING id
+        """)
         result = await db.execute(query_insert_author, {"author_name": author_name})
         author = result.fetchone()
+
+    if not author:
+        # A concurrent writer inserted the same author between our SELECT and INSERT
+        result = await db.execute(query_author, {"author_name": author_name})
+        author = result.fetchone()
         if not author:
             raise HTTPException(status_code=500, detail="Failed to create author")
-        await db.commit()
 
     return author[0]
 
@@ -32,23 +65,27 @@ async def create_book(db: AsyncSession, book: BookCreate):
 
     author_id = await validate_or_create_author(db, book.author)
 
-    query_insert_book = text("""
-        INSERT INTO books (title, genre, published_year, author_id)
-        VALUES (:title, :genre, :published_year, :author_id)
-        RETURNING id, title, genre, published_year, author_id
+    query_insert_book = queries.text("insert_book", """
+        INSERT INTO books (title, genre, published_year, author_id, author_name)
+        VALUES (:title, :genre, :published_year, :author_id, :author_name)
+        ON CONFLICT (title, author_id, published_year) DO NOTHING
+        RETURNING id, title, genre, published_year, author_id, version, updated_at
     """)
     result = await db.execute(query_insert_book, {
         "title": book.title,
         "genre": book.genre,
         "published_year": book.published_year,
-        "author_id": author_id
+        "author_id": author_id,
+        "author_name": book.author
     })
     book_data = result.fetchone()
 
     if not book_data:
-        raise HTTPException(status_code=500, detail="Failed to create book")
+        raise HTTPException(status_code=409, detail=DUPLICATE_BOOK_DETAIL)
 
     await db.commit()
+    author_cache.set(book.author, author_id)
+    await book_cache.invalidate_books(book_data[0])
 
     book_dict = dict(zip(result.keys(), book_data))
     book_dict["author"] = {"id": author_id, "name": book.author}
@@ -60,10 +97,10 @@ async def get_book_by_id(db: AsyncSession, book_id: int):
     if book_id <= 0:
         raise HTTPException(status_code=400, detail="Invalid book ID")
 
-    query = text("""
-    SELECT books.*, authors.id AS author_id, authors.name AS author_name 
-    FROM books 
-    JOIN authors ON books.author_id = authors.id
+    author_name, join = _author_name_source()
+    query = queries.text(("select_book_by_id", join), lambda: f"""
+    SELECT {BOOK_COLUMNS}, {author_name} AS author_name
+    FROM books{join}
     WHERE books.id = :book_id
     """)
     result = await db.execute(query, {"book_id": book_id})
@@ -79,6 +116,12 @@ async def get_book_by_id(db: AsyncSession, book_id: int):
     return book_dict
 
 
+def _returning_author_name() -> str:
+    if settings.BOOKS_DENORMALIZED_READS:
+        return "author_name"
+    return "(SELECT name FROM authors WHERE authors.id = books.author_id) AS author_name"
+
+
 async def update_book(db: AsyncSession, book_id: int, book: BookUpdate):
     if book_id <= 0:
         raise HTTPException(status_code=400, detail="Invalid book ID")
@@ -88,30 +131,37 @@ async def update_book(db: AsyncSession, book_id: int, book: BookUpdate):
     if "author" in book_data:
         author_id = await validate_or_create_author(db, book_data["author"])
         book_data["author_id"] = author_id
-        book_data.pop("author", None)
+        book_data["author_name"] = book_data.pop("author")
 
     if not book_data:
         raise HTTPException(status_code=400, detail="No fields provided for update")
 
-    set_clause = ", ".join(f"{key} = :{key}" for key in book_data.keys())
+    fields = tuple(sorted(book_data))
+    set_clause = ", ".join(f"{key} = :{key}" for key in fields)
 
-    query = text(f"""
+    query = queries.text(("update_book", fields, settings.BOOKS_DENORMALIZED_READS), lambda: f"""
     UPDATE books 
-    SET {set_clause} 
+    SET {set_clause}, version = version + 1, updated_at = CURRENT_TIMESTAMP
     WHERE id = :book_id 
-    RETURNING books.*, (SELECT name FROM authors WHERE authors.id = books.author_id) AS author_name
+    RETURNING id, title, genre, published_year, author_id, version, updated_at, {_returning_author_name()}
     """)
     book_data["book_id"] = book_id
 
-    result = await db.execute(query, book_data)
+    try:
+        result = await db.execute(query, book_data)
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=409, detail=DUPLICATE_BOOK_DETAIL)
     updated_book = result.fetchone()
 
     if not updated_book:
         raise HTTPException(status_code=404, detail=f"Book with ID {book_id} not found")
 
     await db.commit()
+    await book_cache.invalidate_books(book_id)
 
     updated_book_dict = dict(zip(result.keys(), updated_book))
+    author_cache.set(updated_book_dict["author_name"], updated_book_dict["author_id"])
     updated_book_dict["author"] = {"id": updated_book_dict["author_id"], "name": updated_book_dict.pop("author_name")}
     updated_book_dict.pop("author_id")
 
@@ -122,47 +172,295 @@ async def delete_book(db: AsyncSession, book_id: int):
     if book_id <= 0:
         raise HTTPException(status_code=400, detail="Invalid book ID")
 
-    query = text("DELETE FROM books WHERE id = :book_id RETURNING id")
+    query = queries.text("delete_book", "DELETE FROM books WHERE id = :book_id RETURNING id")
     result = await db.execute(query, {"book_id": book_id})
 
     if not result.fetchone():
         raise HTTPException(status_code=404, detail=f"Book with ID {book_id} not found")
 
     await db.commit()
+    await book_cache.invalidate_books(book_id)
     return {"message": f"Book with ID {book_id} has been deleted"}
 
 
-async def get_books(db: AsyncSession, filters: dict, sort_by: str = "title", sort_order: str = "asc",
-                    page: int = 1, page_size: int = settings.PAGE_SIZE):
-    if page < 1 or page_size < 1:
-        raise HTTPException(status_code=400, detail="Page number and page size must be positive integers")
+def _validate_batch_size(items: list):
+    if not items or len(items) > settings.BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=400, detail=f"Batch must contain between 1 and {settings.BATCH_MAX_SIZE} items"
+        )
+
+
+def _book_with_author(book: dict) -> dict:
+    book["author"] = {"id": book.pop("author_id"), "name": book.pop("author_name")}
+    return book
+
+
+async def create_books(db: AsyncSession, books: List[BookCreate]):
+    _validate_batch_size(books)
+
+    results = [{"index": index, "status": "created"} for index in range(len(books))]
+    valid = []
+    for index, book in enumerate(books):
+        if not book.title or not book.title.strip():
+            results[index].update(status="error", detail="Book title cannot be empty")
+        elif not book.author or not book.author.strip():
+            results[index].update(status="error", detail="Author name cannot be empty")
+        else:
+            valid.append(index)
+
+    if not valid:
+        return results
+
+    author_ids = await _resolve_author_ids(db, [books[index].author for index in valid])
+
+    params = {}
+    for position, index in enumerate(valid):
+        book = books[index]
+        params.update({
+            f"title_{position}": book.title,
+            f"genre_{position}": book.genre,
+            f"published_year_{position}": book.published_year,
+            f"author_id_{position}": author_ids[book.author],
+            f"author_name_{position}": book.author
+        })
+
+    values = ", ".join(
+        f"(:title_{position}, :genre_{position}, :published_year_{position}, :author_id_{position}, "
+        f":author_name_{position})"
+        for position in range(len(valid))
+    )
+    query = queries.text(("insert_books", len(valid)), lambda: f"""
+        INSERT INTO books (title, genre, published_year, author_id, author_name)
+        VALUES {values}
+        ON CONFLICT ({NATURAL_KEY}) DO NOTHING
+        RETURNING id, title, genre, published_year, author_id, version, updated_at
+    """)
+    result = await db.execute(query, params)
+    # Conflicting rows are skipped, so created rows are matched back to the input by natural key
+    created = {
+        (row["title"], row["author_id"], row["published_year"]): row
+        for row in (dict(zip(result.keys(), row)) for row in result.fetchall())
+    }
+
+    await db.commit()
+    for name, author_id in author_ids.items():
+        author_cache.set(name, author_id)
+    await book_cache.invalidate_books(*(book["id"] for book in created.values()))
+
+    for index in valid:
+        book = created.pop((books[index].title, author_ids[books[index].author], books[index].published_year), None)
+        if book is None:
+            results[index].update(status="conflict", detail=DUPLICATE_BOOK_DETAIL)
+        else:
+            book["author_name"] = books[index].author
+            results[index].update(id=book["id"], book=_book_with_author(book))
+
+    return results
+
+
+async def update_books(db: AsyncSession, updates: List[BookBatchUpdate]):
+    _validate_batch_size(updates)
+
+    results = [{"index": index, "id": update.id, "status": "updated"} for index, update in enumerate(updates)]
+    changes, seen = {}, set()
+    for index, update in enumerate(updates):
+        book_data = update.model_dump(exclude_unset=True, exclude={"id"})
+        if update.id <= 0:
+            results[index].update(status="error", detail="Invalid book ID")
+        elif update.id in seen:
+            results[index].update(status="error", detail="Duplicate book ID in batch")
+        elif not book_data:
+            results[index].update(status="error", detail="No fields provided for update")
+        elif "author" in book_data and (not book_data["author"] or not book_data["author"].strip()):
+            results[index].update(status="error", detail="Author name cannot be empty")
+        else:
+            changes[index] = book_data
+            seen.add(update.id)
+
+    if not changes:
+        return results
+
+    author_names = [book_data["author"] for book_data in changes.values() if "author" in book_data]
+    author_ids = await _resolve_author_ids(db, author_names) if author_names else {}
+    for book_data in changes.values():
+        if "author" in book_data:
+            book_data["author_name"] = book_data.pop("author")
+            book_data["author_id"] = author_ids[book_data["author_name"]]
+
+    updated, conflicts = {}, set()
+    try:
+        async with db.begin_nested():
+            updated = await _apply_batch_update(db, updates, changes)
+    except IntegrityError:
+        # One duplicate fails the whole statement, so retry item by item to report only the conflicting ones
+        for index, book_data in changes.items():
+            try:
+                async with db.begin_nested():
+                    updated.update(await _apply_batch_update(db, updates, {index: book_data}))
+            except IntegrityError:
+                conflicts.add(index)
+
+    await db.commit()
+    for name, author_id in author_ids.items():
+        author_cache.set(name, author_id)
+    await book_cache.invalidate_books(*updated)
+
+    for index in changes:
+        book = updated.get(updates[index].id)
+        if index in conflicts:
+            results[index].update(status="conflict", detail=DUPLICATE_BOOK_DETAIL)
+        elif book is None:
+            results[index].update(status="not_found", detail=f"Book with ID {updates[index].id} not found")
+        else:
+            results[index]["book"] = _book_with_author(book)
+
+    return results
+
+
+async def _apply_batch_update(db: AsyncSession, updates: List[BookBatchUpdate], changes: dict) -> dict:
+    params = {}
+    whens = {"title": [], "genre": [], "published_year": [], "author_id": [], "author_name": []}
+    for index, book_data in changes.items():
+        params[f"id_{index}"] = updates[index].id
+        for key, value in book_data.items():
+            whens[key].append(f"WHEN :id_{index} THEN :{key}_{index}")
+            params[f"{key}_{index}"] = value
+
+    set_clause = ", ".join(
+        f"{key} = CASE books.id {' '.join(clauses)} ELSE books.{key} END" for key, clauses in whens.items() if clauses
+    )
+    ids = ", ".join(f":id_{index}" for index in changes)
+
+    # The CASE layout depends on which fields each item sets, so these one-off statements bypass the registry
+    query = text(f"""
+    UPDATE books 
+    SET {set_clause}, version = version + 1, updated_at = CURRENT_TIMESTAMP
+    WHERE books.id IN ({ids})
+    RETURNING id, title, genre, published_year, author_id, version, updated_at, {_returning_author_name()}
+    """)
+    result = await db.execute(query, params)
+    return {row["id"]: row for row in (dict(zip(result.keys(), row)) for row in result.fetchall())}
+
 
+async def delete_books(db: AsyncSession, book_ids: List[int]):
+    _validate_batch_size(book_ids)
+
+    valid_ids = list({book_id for book_id in book_ids if book_id > 0})
+    deleted = set()
+    if valid_ids:
+        query = queries.text("delete_books", "DELETE FROM books WHERE id IN :book_ids RETURNING id", ["book_ids"])
+        result = await db.execute(query, {"book_ids": valid_ids})
+        deleted = {row[0] for row in result.fetchall()}
+
+        await db.commit()
+        await book_cache.invalidate_books(*deleted)
+
+    results = []
+    for index, book_id in enumerate(book_ids):
+        if book_id <= 0:
+            results.append({"index": index, "id": book_id, "status": "error", "detail": "Invalid book ID"})
+        elif book_id in deleted:
+            results.append({"index": index, "id": book_id, "status": "deleted"})
+        else:
+            results.append({
+                "index": index, "id": book_id, "status": "not_found", "detail": f"Book with ID {book_id} not found"
+            })
+    return results
+
+
+def encode_cursor(sort_by: str, sort_order: str, book: dict) -> str:
+    payload = json.dumps([sort_by, sort_order, book[sort_by], book["id"]], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+CURSOR_VALUE_TYPES = {"title": str, "genre": str, "published_year": int, "name": str}
+
+
+def _is_cursor_value(value, expected: type) -> bool:
+    return isinstance(value, expected) and not isinstance(value, bool)
+
+
+def decode_cursor(cursor: str, sort_by: str, sort_order: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort_by, cursor_sort_order, value, book_id = json.loads(base64.urlsafe_b64decode(padded))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if (cursor_sort_by, cursor_sort_order) != (sort_by, sort_order):
+        raise HTTPException(status_code=400, detail="Cursor does not match the requested sort order")
+    # The value is bound straight into the keyset comparison, so its type must match the sort column
+    if not _is_cursor_value(value, CURSOR_VALUE_TYPES[sort_by]) or not _is_cursor_value(book_id, int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    return value, book_id
+
+
+def _validate_sort(sort_by: str, sort_order: str):
     valid_sort_fields = {"title", "genre", "published_year"}
     if sort_by not in valid_sort_fields:
         raise HTTPException(status_code=400, detail=f"Invalid sort field: {sort_by}")
+    if sort_order.lower() not in {"asc", "desc"}:
+        raise HTTPException(status_code=400, detail=f"Invalid sort order: {sort_order}")
 
-    query = text("""
-    SELECT books.*, authors.id AS author_id, authors.name AS author_name
-    FROM books 
-    JOIN authors ON books.author_id = authors.id
-    """)
 
+FILTER_FIELDS = {"title", "genre", "published_year", "author_id"}
+FILTER_OPERATORS = {"eq": "=", "gte": ">=", "lte": "<=", "in": "IN", "prefix": "LIKE"}
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _compile_filters(filters: dict, query_params: dict):
     filter_clauses = []
-    query_params = {}
+    expanding = []
 
     for attr, value in filters.items():
-        if value is not None:
-            field_name = attr.split("__")[0]
-            filter_clauses.append(f"{field_name} = :{field_name}")
-            query_params[field_name] = value
+        if value is None:
+            continue
+
+        field_name, _, operator = attr.partition("__")
+        operator = operator or "eq"
+        if field_name not in FILTER_FIELDS or operator not in FILTER_OPERATORS:
+            raise HTTPException(status_code=400, detail=f"Invalid filter: {attr}")
+
+        param = f"{field_name}__{operator}"
+        if operator == "in":
+            value = list(value)
+            expanding.append(param)
+        elif operator == "prefix":
+            value = _escape_like(value) + "%"
+
+        clause = f"books.{field_name} {FILTER_OPERATORS[operator]} :{param}"
+        if operator == "prefix":
+            clause += " ESCAPE '\\'"
+
+        filter_clauses.append(clause)
+        query_params[param] = value
+
+    # A canonical clause order means every filter combination maps to exactly one statement
+    return sorted(filter_clauses), sorted(expanding)
+
+
+def _build_select_books(filter_clauses: list, order_by: str) -> str:
+    author_name, join = _author_name_source()
+    query = f"""
+    SELECT {BOOK_COLUMNS}, {author_name} AS author_name
+    FROM books{join}
+    """
 
     if filter_clauses:
-        query = text(query.text + " WHERE " + " AND ".join(filter_clauses))
+        query += " WHERE " + " AND ".join(filter_clauses)
+
+    return query + f" ORDER BY {order_by} LIMIT :limit OFFSET :offset"
 
-    query = text(query.text + f" ORDER BY {sort_by} {sort_order.upper()} LIMIT :limit OFFSET :offset")
-    query_params["limit"] = page_size
-    query_params["offset"] = (page - 1) * page_size
 
+async def _select_books(db: AsyncSession, filter_clauses: list, expanding: list, query_params: dict, order_by: str):
+    query = queries.text(
+        ("select_books", tuple(filter_clauses), order_by, settings.BOOKS_DENORMALIZED_READS),
+        lambda: _build_select_books(filter_clauses, order_by), expanding
+    )
     result = await db.execute(query, query_params)
     books = [dict(zip(result.keys(), row)) for row in result.fetchall()]
 
@@ -172,27 +470,521 @@ async def get_books(db: AsyncSession, filters: dict, sort_by: str = "title", sor
     return books
 
 
-async def bulk_import_books(db: AsyncSession, file_path: str):
-    books = []
-    if file_path.endswith(".json"):
-        with open(file_path, "r", encoding="utf-8") as f:
-            books = json.load(f)
-    elif file_path.endswith(".csv"):
-        with open(file_path, newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            books = [row for row in reader]
+async def get_books(db: AsyncSession, filters: dict, sort_by: str = "title", sort_order: str = "asc",
+                    page: int = 1, page_size: int = settings.PAGE_SIZE):
+    if page < 1 or page_size < 1:
+        raise HTTPException(status_code=400, detail="Page number and page size must be positive integers")
+
+    _validate_sort(sort_by, sort_order)
+    order = sort_order.upper()
+
+    query_params = {"limit": page_size, "offset": (page - 1) * page_size}
+    filter_clauses, expanding = _compile_filters(filters, query_params)
+
+    order_by = f"books.{sort_by} {order}, books.id {order}"
+    return await _select_books(db, filter_clauses, expanding, query_params, order_by)
+
+
+async def get_books_by_cursor(db: AsyncSession, filters: dict, sort_by: str = "title", sort_order: str = "asc",
+                              page_size: int = settings.PAGE_SIZE, cursor: Optional[str] = None):
+    if page_size < 1:
+        raise HTTPException(status_code=400, detail="Page size must be a positive integer")
+
+    _validate_sort(sort_by, sort_order)
+    order = sort_order.upper()
+
+    query_params = {"limit": page_size + 1, "offset": 0}
+    filter_clauses, expanding = _compile_filters(filters, query_params)
+
+    if cursor:
+        query_params["cursor_value"], query_params["cursor_id"] = decode_cursor(cursor, sort_by, sort_order)
+        comparison = ">" if order == "ASC" else "<"
+        filter_clauses.append(f"(books.{sort_by}, books.id) {comparison} (:cursor_value, :cursor_id)")
+
+    order_by = f"books.{sort_by} {order}, books.id {order}"
+    books = await _select_books(db, filter_clauses, expanding, query_params, order_by)
+
+    next_cursor = None
+    if len(books) > page_size:
+        books = books[:page_size]
+        next_cursor = encode_cursor(sort_by, sort_order, books[-1])
+
+    return {"items": books, "next_cursor": next_cursor}
+
+
+def _filters_where(filters: dict, query_params: dict):
+    filter_clauses, expanding = _compile_filters(filters, query_params)
+    where = " WHERE " + " AND ".join(filter_clauses) if filter_clauses else ""
+    return where, expanding
+
+
+async def _estimate_book_count(db: AsyncSession, filters: dict):
+    query_params = {}
+    where, expanding = _filters_where(filters, query_params)
+
+    if db.get_bind().dialect.name == "postgresql":
+        if not where:
+            query = queries.text(
+                "estimate_books", "SELECT reltuples::bigint FROM pg_class WHERE oid = 'books'::regclass"
+            )
+            result = await db.execute(query)
+            estimate = result.scalar()
+            # reltuples is -1 until the table has been vacuumed or analyzed
+            if estimate is not None and estimate >= 0:
+                return estimate
+        else:
+            query = queries.text(
+                ("explain_books", where), f"EXPLAIN (FORMAT JSON) SELECT 1 FROM books{where}", expanding
+            )
+            result = await db.execute(query, query_params)
+            plan = result.scalar()
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            return int(plan[0]["Plan"]["Plan Rows"])
+
+    # Without planner statistics, fall back to an exact count that is reused until COUNT_CACHE_TTL expires
+    cache_key = json.dumps(filters, sort_keys=True, default=str)
+    estimate = count_cache.get(cache_key)
+    if estimate is None:
+        query = queries.text(("count_books", where), f"SELECT COUNT(*) FROM books{where}", expanding)
+        estimate = (await db.execute(query, query_params)).scalar()
+        count_cache.set(cache_key, estimate)
+    return estimate
+
+
+async def count_books(db: AsyncSession, filters: dict, with_facets: bool = False, approximate: bool = False):
+    if approximate and not with_facets:
+        return {"total": await _estimate_book_count(db, filters), "total_is_estimate": True}
+
+    query_params = {}
+    where, expanding = _filters_where(filters, query_params)
+
+    if not with_facets:
+        query = queries.text(("count_books", where), f"SELECT COUNT(*) FROM books{where}", expanding)
+        return {"total": (await db.execute(query, query_params)).scalar(), "total_is_estimate": False}
+
+    query_params["facet_limit"] = settings.FACET_LIMIT
+    query = queries.text(("facet_books", where), lambda: f"""
+    SELECT 'genre' AS facet, genre AS value, COUNT(*) AS count
+    FROM books{where}
+    GROUP BY genre
+    UNION ALL
+    SELECT 'published_decade', CAST(published_year / 10 * 10 AS VARCHAR), COUNT(*)
+    FROM books{where}
+    GROUP BY published_year / 10 * 10
+    UNION ALL
+    SELECT facet, value, count FROM (
+        SELECT 'author_id' AS facet, CAST(author_id AS VARCHAR) AS value, COUNT(*) AS count
+        FROM books{where}
+        GROUP BY author_id
+        ORDER BY COUNT(*) DESC, author_id
+        LIMIT :facet_limit
+    ) AS author_facet
+    """, expanding)
+    result = await db.execute(query, query_params)
+
+    facets = {"genre": [], "published_decade": [], "author_id": []}
+    for facet, value, count in result.fetchall():
+        facets[facet].append({"value": value if facet == "genre" else int(value), "count": count})
+
+    for values in facets.values():
+        values.sort(key=lambda item: (-item["count"], item["value"]))
+
+    # Every book has exactly one genre, so the genre buckets add up to the exact total
+    total = sum(item["count"] for item in facets["genre"])
+    return {"total": total, "total_is_estimate": False, "facets": facets}
+
+
+def _search_trigrams(q: str) -> str:
+    q = q.lower()
+    trigrams = dict.fromkeys(q[i:i + 3] for i in range(len(q) - 2))
+    return " OR ".join('"' + trigram.replace('"', '""') + '"' for trigram in trigrams)
+
+
+async def search_books(db: AsyncSession, q: str, limit: int = settings.PAGE_SIZE):
+    q = (q or "").strip()
+    if not q:
+        raise HTTPException(status_code=400, detail="Search query cannot be empty")
+    if limit < 1 or limit > settings.SEARCH_MAX_RESULTS:
+        raise HTTPException(status_code=400, detail=f"Limit must be between 1 and {settings.SEARCH_MAX_RESULTS}")
+
+    escaped = _escape_like(q)
+    query_params = {"q": q, "prefix": escaped + "%", "pattern": "%" + escaped + "%", "limit": limit}
+    columns = """books.id, books.title, books.genre, books.published_year, books.version, books.updated_at,
+        authors.id AS author_id, authors.name AS author_name"""
+
+    if db.get_bind().dialect.name == "postgresql":
+        query = queries.text("search_books_postgresql", f"""
+        WITH candidates AS (
+            SELECT id FROM books WHERE title ILIKE :pattern ESCAPE '\\' OR title % :q
+            UNION
+            SELECT books.id FROM books JOIN authors ON books.author_id = authors.id
+            WHERE authors.name ILIKE :pattern ESCAPE '\\' OR authors.name % :q
+        )
+        SELECT {columns},
+            GREATEST(similarity(books.title, :q), similarity(authors.name, :q))
+            + CASE WHEN books.title ILIKE :prefix ESCAPE '\\' THEN 1.0
+                   WHEN books.title ILIKE :pattern ESCAPE '\\' THEN 0.5 ELSE 0 END AS score
+        FROM candidates
+        JOIN books ON books.id = candidates.id
+        JOIN authors ON books.author_id = authors.id
+        ORDER BY score DESC, books.id
+        LIMIT :limit
+        """)
+    elif len(q) >= 3:
+        # The trigram FTS5 table matches any shared trigram; bm25 ranks rows sharing more of them first
+        query_params["match"] = _search_trigrams(q)
+        query = queries.text("search_books_fts", f"""
+        SELECT {columns},
+            (CASE WHEN books.title LIKE :prefix ESCAPE '\\' THEN 1.0
+                  WHEN books.title LIKE :pattern ESCAPE '\\' THEN 0.5 ELSE 0 END) - bm25(books_search) AS score
+        FROM books_search
+        JOIN books ON books.id = books_search.rowid
+        JOIN authors ON books.author_id = authors.id
+        WHERE books_search MATCH :match
+        ORDER BY score DESC, books.id
+        LIMIT :limit
+        """)
     else:
-        raise HTTPException(status_code=400, detail="Unsupported file format")
+        query = queries.text("search_books_prefix", f"""
+        SELECT {columns},
+            CASE WHEN books.title LIKE :prefix ESCAPE '\\' THEN 1.0 ELSE 0.5 END AS score
+        FROM books
+        JOIN authors ON books.author_id = authors.id
+        WHERE books.title LIKE :prefix ESCAPE '\\' OR authors.name LIKE :prefix ESCAPE '\\'
+        ORDER BY score DESC, books.id
+        LIMIT :limit
+        """)
+
+    result = await db.execute(query, query_params)
+    return [_book_with_author(dict(zip(result.keys(), row))) for row in result.fetchall()]
+
+
+async def stream_books(db: AsyncSession, filters: dict, batch_size: int = settings.EXPORT_BATCH_SIZE):
+    query_params = {}
+    where, expanding = _filters_where(filters, query_params)
+
+    author_name, join = _author_name_source()
+    query = queries.text(("stream_books", where, join), lambda: f"""
+    SELECT books.id, books.title, books.genre, books.published_year, books.author_id, {author_name} AS author_name
+    FROM books{join}{where}
+    ORDER BY books.id
+    """, expanding)
+    result = await db.stream(query, query_params, execution_options={"yield_per": batch_size})
+    async for row in result.mappings():
+        yield row
+
+
+async def stream_book_changes(db: AsyncSession, since: int = 0, limit: Optional[int] = None,
+                              batch_size: int = settings.EXPORT_BATCH_SIZE):
+    # Changes are collapsed to the latest one per book; books that no longer exist come back as tombstones
+    limit_clause = "\n    LIMIT :limit" if limit is not None else ""
+    query = queries.text(("stream_book_changes", limit_clause, settings.BOOKS_DENORMALIZED_READS), lambda: f"""
+    SELECT latest.seq, latest.book_id, books.id, books.title, books.genre, books.published_year, books.author_id,
+        books.version, books.updated_at, {_returning_author_name()}
+    FROM (
+        SELECT book_id, MAX(seq) AS seq FROM book_changes WHERE seq > :since GROUP BY book_id
+    ) AS latest
+    LEFT JOIN books ON books.id = latest.book_id
+    ORDER BY latest.seq{limit_clause}
+    """)
+    params = {"since": since} if limit is None else {"since": since, "limit": limit}
+    result = await db.stream(query, params, execution_options={"yield_per": batch_size})
+    async for row in result.mappings():
+        yield row
 
-    for book in books:
-        author_id = await validate_or_create_author(db, book.get("author"))
-        book["author_id"] = author_id
 
-    query = text("""
-    INSERT INTO books (title, genre, published_year, author_id) 
-    VALUES (:title, :genre, :published_year, :author_id)
+async def latest_book_change(db: AsyncSession) -> int:
+    query = queries.text("latest_book_change", "SELECT COALESCE(MAX(seq), 0) FROM book_changes")
+    return (await db.execute(query)).scalar()
+
+
+async def sync_book_cache(db: AsyncSession, since: int, batch_size: int = settings.EXPORT_BATCH_SIZE) -> int:
+    # Writes made by other workers or processes only reach this worker's cache through the change log
+    query = queries.text("book_changes_since", """
+    SELECT seq, book_id FROM book_changes WHERE seq > :since ORDER BY seq LIMIT :limit
+    """)
+    while True:
+        rows = (await db.execute(query, {"since": since, "limit": batch_size})).fetchall()
+        if rows:
+            await book_cache.invalidate_books(*{book_id for _, book_id in rows})
+            since = rows[-1][0]
+        if len(rows) < batch_size:
+            return since
+
+
+async def compact_book_changes(db: AsyncSession) -> int:
+    # Only entries superseded by a later change to the same book go, so every feed position returns the same books
+    query = queries.text("compact_book_changes", """
+    DELETE FROM book_changes
+    WHERE seq NOT IN (SELECT MAX(seq) FROM book_changes GROUP BY book_id)
     """)
-    await db.execute(query, books)
+    result = await db.execute(query)
     await db.commit()
+    return result.rowcount
+
+
+async def _attach_author_books(db: AsyncSession, authors: List[dict], books_limit: int):
+    if not authors:
+        return authors
+
+    # One query loads the books of every author on the page, capped per author. The counts come from their own
+    # GROUP BY so they do not depend on how many books survive the cap.
+    query = queries.text("select_author_books", """
+    SELECT counts.author_id, counts.book_count, ranked.id, ranked.title, ranked.genre, ranked.published_year
+    FROM (
+        SELECT author_id, COUNT(*) AS book_count
+        FROM books
+        WHERE author_id IN :author_ids
+        GROUP BY author_id
+    ) counts
+    LEFT JOIN (
+        SELECT books.id, books.title, books.genre, books.published_year, books.author_id,
+            ROW_NUMBER() OVER (PARTITION BY books.author_id ORDER BY books.title, books.id) AS position
+        FROM books
+        WHERE books.author_id IN :author_ids
+    ) ranked ON ranked.author_id = counts.author_id AND ranked.position <= :books_limit
+    ORDER BY counts.author_id, ranked.position
+    """, ["author_ids"])
+    result = await db.execute(query, {"author_ids": [author["id"] for author in authors], "books_limit": books_limit})
+
+    by_author = {author["id"]: author for author in authors}
+    for author in authors:
+        author.update(books=[], book_count=0)
+    for book in result.mappings():
+        author = by_author[book["author_id"]]
+        author["book_count"] = book["book_count"]
+        if book["id"] is not None:
+            author["books"].append({key: book[key] for key in ("id", "title", "genre", "published_year")})
+
+    return authors
+
+
+def _validate_books_limit(books_limit: int):
+    if books_limit < 0 or books_limit > settings.AUTHOR_BOOKS_LIMIT:
+        raise HTTPException(
+            status_code=400, detail=f"Books limit must be between 0 and {settings.AUTHOR_BOOKS_LIMIT}"
+        )
+
+
+async def get_authors(db: AsyncSession, name_prefix: Optional[str] = None, page_size: int = settings.PAGE_SIZE,
+                      cursor: Optional[str] = None, books_limit: int = settings.AUTHOR_BOOKS_LIMIT):
+    if page_size < 1:
+        raise HTTPException(status_code=400, detail="Page size must be a positive integer")
+    _validate_books_limit(books_limit)
+
+    clauses, query_params = [], {"limit": page_size + 1}
+    if name_prefix:
+        clauses.append("name LIKE :name_prefix ESCAPE '\\'")
+        query_params["name_prefix"] = _escape_like(name_prefix) + "%"
+    if cursor:
+        query_params["cursor_name"], query_params["cursor_id"] = decode_cursor(cursor, "name", "asc")
+        clauses.append("(name, id) > (:cursor_name, :cursor_id)")
+
+    where = " WHERE " + " AND ".join(clauses) if clauses else ""
+    query = queries.text(("select_authors", where), f"""
+    SELECT id, name FROM authors{where}
+    ORDER BY name, id
+    LIMIT :limit
+    """)
+    result = await db.execute(query, query_params)
+    authors = [dict(row) for row in result.mappings()]
+
+    next_cursor = None
+    if len(authors) > page_size:
+        authors = authors[:page_size]
+        next_cursor = encode_cursor("name", "asc", authors[-1])
 
-    return {"message": f"Successfully imported {len(books)} books"}
+    return {"items": await _attach_author_books(db, authors, books_limit), "next_cursor": next_cursor}
+
+
+async def get_author_by_id(db: AsyncSession, author_id: int, books_limit: int = settings.AUTHOR_BOOKS_LIMIT):
+    if author_id <= 0:
+        raise HTTPException(status_code=400, detail="Invalid author ID")
+    _validate_books_limit(books_limit)
+
+    query = queries.text("select_author_by_id", "SELECT id, name FROM authors WHERE id = :author_id")
+    result = await db.execute(query, {"author_id": author_id})
+    author = result.mappings().first()
+
+    if not author:
+        raise HTTPException(status_code=404, detail=f"Author with ID {author_id} not found")
+
+    return (await _attach_author_books(db, [dict(author)], books_limit))[0]
+
+
+def _normalize_import_row(row) -> dict:
+    if not isinstance(row, dict):
+        raise ValueError("Row must be an object")
+
+    title, author, genre = row.get("title"), row.get("author"), row.get("genre")
+    if not isinstance(title, str) or not title.strip():
+        raise ValueError("Book title cannot be empty")
+    if not isinstance(author, str) or not author.strip():
+        raise ValueError("Author name cannot be empty")
+    if not isinstance(genre, str) or not genre.strip():
+        raise ValueError("Genre cannot be empty")
+
+    try:
+        published_year = int(row.get("published_year"))
+    except (TypeError, ValueError):
+        raise ValueError("Invalid published year")
+
+    return {"title": title, "genre": genre, "published_year": published_year, "author": author}
+
+
+async def _resolve_author_ids(db: AsyncSession, names) -> dict:
+    author_ids = {}
+    for name in dict.fromkeys(names):
+        author_id = author_cache.get(name)
+        if author_id is not None:
+            author_ids[name] = author_id
+
+    names = [name for name in dict.fromkeys(names) if name not in author_ids]
+    if not names:
+        return author_ids
+
+    query_select = queries.text(
+        "select_authors_by_name", "SELECT id, name FROM authors WHERE name IN :names", ["names"]
+    )
+    result = await db.execute(query_select, {"names": names})
+    author_ids.update({name: author_id for author_id, name in result.fetchall()})
+
+    missing = [name for name in names if name not in author_ids]
+    if missing:
+        query_insert = queries.text(
+            "insert_authors", "INSERT INTO authors (name) VALUES (:name) ON CONFLICT (name) DO NOTHING"
+        )
+        await db.execute(query_insert, [{"name": name} for name in missing])
+        result = await db.execute(query_select, {"names": missing})
+        author_ids.update({name: author_id for author_id, name in result.fetchall()})
+
+    return author_ids
+
+
+def _import_statement(mode: str, size: int):
+    def build():
+        values = ", ".join(
+            f"(:title_{n}, :genre_{n}, :published_year_{n}, :author_id_{n}, :author_name_{n})" for n in range(size)
+        )
+        if mode == "upsert":
+            # Only rows whose genre differs are rewritten; untouched rows are not returned at all
+            conflict = f"""DO UPDATE
+            SET genre = excluded.genre, version = books.version + 1, updated_at = CURRENT_TIMESTAMP
+            WHERE books.genre <> excluded.genre"""
+        else:
+            conflict = "DO NOTHING"
+        return f"""
+        INSERT INTO books (title, genre, published_year, author_id, author_name)
+        VALUES {values}
+        ON CONFLICT ({NATURAL_KEY}) {conflict}
+        RETURNING id, version
+        """
+    return queries.text(("import_books", mode, size), build)
+
+
+async def _import_chunk(db: AsyncSession, rows: list, mode: str):
+    author_ids = await _resolve_author_ids(db, [row["author"] for row in rows])
+    # A statement may not hit the same natural key twice, so the last occurrence in a chunk wins
+    unique = {(row["title"], author_ids[row["author"]], row["published_year"]): row for row in rows}
+    counts = {"inserted": 0, "updated": 0, "unchanged": len(rows) - len(unique)}
+    updated_ids = []
+
+    batch = list(unique.values())
+    for start in range(0, len(batch), IMPORT_VALUES_ROWS):
+        part = batch[start:start + IMPORT_VALUES_ROWS]
+        params = {}
+        for n, row in enumerate(part):
+            params.update({
+                f"title_{n}": row["title"],
+                f"genre_{n}": row["genre"],
+                f"published_year_{n}": row["published_year"],
+                f"author_id_{n}": author_ids[row["author"]],
+                f"author_name_{n}": row["author"]
+            })
+        result = await db.execute(_import_statement(mode, len(part)), params)
+        written = result.fetchall()
+        # New rows start at version 1, so any higher version was written by the DO UPDATE branch
+        updated_ids.extend(book_id for book_id, version in written if version > 1)
+        counts["inserted"] += sum(1 for _, version in written if version == 1)
+        counts["unchanged"] += len(part) - len(written)
+
+    counts["updated"] = len(updated_ids)
+    return author_ids, counts, updated_ids
+
+
+async def _import_rows(db: AsyncSession, rows, chunk_size: int, commit_every: int, progress, mode: str):
+    stats = {"processed": 0, "imported": 0, "inserted": 0, "updated": 0, "unchanged": 0, "failed": 0}
+    errors = []
+    chunk = []
+    uncommitted = 0
+    pending_authors = {}
+    pending_books = []
+
+    async def commit():
+        await db.commit()
+        for name, author_id in pending_authors.items():
+            author_cache.set(name, author_id)
+        pending_authors.clear()
+        await book_cache.invalidate_books(*pending_books)
+        pending_books.clear()
+
+    async def flush():
+        nonlocal chunk, uncommitted
+        if chunk:
+            author_ids, counts, updated_ids = await _import_chunk(db, chunk, mode)
+            pending_authors.update(author_ids)
+            pending_books.extend(updated_ids)
+            for key, value in counts.items():
+                stats[key] += value
+            stats["imported"] += counts["inserted"] + counts["updated"]
+            uncommitted += len(chunk)
+            chunk = []
+        if uncommitted >= commit_every:
+            await commit()
+            uncommitted = 0
+        if progress:
+            report = progress(dict(stats))
+            if inspect.isawaitable(report):
+                await report
+
+    for row_number, row in enumerate(rows, start=1):
+        stats["processed"] += 1
+        try:
+            chunk.append(_normalize_import_row(row))
+        except ValueError as e:
+            stats["failed"] += 1
+            if len(errors) < settings.IMPORT_MAX_REPORTED_ERRORS:
+                errors.append({"row": row_number, "detail": str(e)})
+
+        if len(chunk) >= chunk_size:
+            await flush()
+
+    await flush()
+    await commit()
+
+    return {
+        "message": f"Successfully imported {stats['imported']} books",
+        "imported": stats["imported"],
+        "inserted": stats["inserted"],
+        "updated": stats["updated"],
+        "unchanged": stats["unchanged"],
+        "failed": stats["failed"],
+        "errors": errors
+    }
+
+
+async def bulk_import_books(db: AsyncSession, source: Union[str, IO[str]], file_format: Optional[str] = None,
+                            chunk_size: int = settings.IMPORT_CHUNK_SIZE,
+                            commit_every: int = settings.IMPORT_COMMIT_EVERY,
+                            progress: Optional[Callable[[dict], Any]] = None, mode: str = "insert"):
+    if chunk_size < 1 or commit_every < 1:
+        raise HTTPException(status_code=400, detail="Chunk size and commit interval must be positive integers")
+    if mode not in IMPORT_MODES:
+        raise HTTPException(status_code=400, detail=f"Invalid import mode: {mode}")
+
+    if isinstance(source, str):
+        file_format = file_format or detect_format(source)
+        with open(source, newline="", encoding="utf-8") as f:
+            return await _import_rows(db, iter_book_rows(f, file_format), chunk_size, commit_every, progress, mode)
+
+    return await _import_rows(db, iter_book_rows(source, file_format), chunk_size, commit_every, progress, mode)
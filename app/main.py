@@ -1,15 +1,83 @@
+import time
+
+# Taken before the application imports so the reported cold start includes them
+IMPORT_STARTED = time.perf_counter()
+
+import asyncio
+import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
-from app.core.database import init_db
-from app.routes import books, auth
+from app.core.config import settings
+from app.core.database import (
+    dispose_engines, get_engine, get_read_engine, get_read_session_factory, get_session_factory, init_db, warm_pool
+)
+from app.core.jobs import job_runner
+from app.core.metrics import MetricsMiddleware, startup_timings
+from app.core.security import password_hasher
+from app.crud.raw_sql_crud import compact_book_changes, latest_book_change, sync_book_cache
+from app.routes import authors, books, auth, jobs, metrics
+
+
+logger = logging.getLogger(__name__)
+
+
+async def compact_change_log(interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with get_session_factory()() as db:
+                removed = await compact_book_changes(db)
+            logger.info("Removed %d superseded book changes", removed)
+        except Exception:
+            logger.exception("Compacting book_changes failed")
+
+
+async def follow_change_log(interval: float):
+    since = None
+    while True:
+        try:
+            async with get_read_session_factory()() as db:
+                since = await latest_book_change(db) if since is None else await sync_book_cache(db, since)
+        except Exception:
+            logger.exception("Syncing the book cache with book_changes failed")
+        await asyncio.sleep(interval)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    started = time.perf_counter()
     await init_db()
+    if settings.DB_POOL_PREWARM:
+        await asyncio.gather(*(warm_pool(pooled) for pooled in {get_engine(), get_read_engine()}))
+    ready = time.perf_counter()
+    startup_timings.update(
+        import_seconds=IMPORTED - IMPORT_STARTED, init_seconds=ready - started, total_seconds=ready - IMPORT_STARTED
+    )
+    logger.info("Worker ready in %.0f ms (imports %.0f ms, schema %s and pool warm-up %.0f ms)",
+                (ready - IMPORT_STARTED) * 1000, (IMPORTED - IMPORT_STARTED) * 1000, settings.DB_SCHEMA_MODE,
+                (ready - started) * 1000)
+    background = []
+    if settings.CHANGE_LOG_COMPACT_INTERVAL > 0:
+        background.append(asyncio.create_task(compact_change_log(settings.CHANGE_LOG_COMPACT_INTERVAL)))
+    if settings.BOOK_CACHE_ENABLED and settings.BOOK_CACHE_SYNC_INTERVAL > 0:
+        background.append(asyncio.create_task(follow_change_log(settings.BOOK_CACHE_SYNC_INTERVAL)))
     yield
+    for task in background:
+        task.cancel()
+    await asyncio.gather(*background, return_exceptions=True)
+    await job_runner.stop(settings.SERVER_GRACEFUL_TIMEOUT)
+    password_hasher.shutdown()
+    await dispose_engines()
 
 
 app = FastAPI(title="Book Management System", version="1.0.0", lifespan=lifespan)
 app.include_router(books.router, prefix="/books", tags=["Books"])
+app.include_router(authors.router, prefix="/authors", tags=["Authors"])
 app.include_router(auth.router, prefix="", tags=["users"])
+app.include_router(jobs.router, prefix="/jobs", tags=["Jobs"])
+app.include_router(metrics.router, prefix="", tags=["metrics"])
+app.add_middleware(
+    MetricsMiddleware, slow_request_ms=settings.SLOW_REQUEST_MS, logger=logging.getLogger("app.requests")
+)
+
+IMPORTED = time.perf_counter()
@@ -1,15 +1,168 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index, DDL, event, func
 from sqlalchemy.orm import relationship
 from app.core.database import Base
 
 
+# Listing columns carried in the sort indexes so PostgreSQL can answer a page with an index-only scan
+LISTING_INCLUDE = ["genre", "published_year", "author_id", "author_name", "version", "updated_at"]
+
+
 class Book(Base):
     __tablename__ = "books"
+    __table_args__ = (
+        Index("ix_books_title_id", "title", "id",
+              postgresql_include=[column for column in LISTING_INCLUDE if column != "title"]),
+        Index("ix_books_genre_id", "genre", "id",
+              postgresql_include=["title"] + [column for column in LISTING_INCLUDE if column != "genre"]),
+        Index("ix_books_published_year_id", "published_year", "id",
+              postgresql_include=["title"] + [column for column in LISTING_INCLUDE if column != "published_year"]),
+        Index("ix_books_genre_published_year", "genre", "published_year"),
+        Index("ix_books_author_id_published_year", "author_id", "published_year"),
+        Index("ux_books_natural_key", "title", "author_id", "published_year", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    title = Column(String, nullable=False, index=True)
+    title = Column(String, nullable=False)
     genre = Column(String, nullable=False)
     published_year = Column(Integer, nullable=False)
     author_id = Column(Integer, ForeignKey("authors.id"), nullable=False)
+    author_name = Column(String, nullable=True)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+    updated_at = Column(DateTime, nullable=False, server_default=func.now())
 
     author = relationship("Author", back_populates="books")
+
+
+class BookChange(Base):
+    __tablename__ = "book_changes"
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    seq = Column(Integer, primary_key=True)
+    book_id = Column(Integer, nullable=False)
+    op = Column(String, nullable=False)
+    changed_at = Column(DateTime, nullable=False, server_default=func.now())
+
+
+# title_prefix filters run LIKE 'prefix%', which PostgreSQL can only serve from a text_pattern_ops btree
+PREFIX_DDL = {
+    "postgresql": [
+        "CREATE INDEX IF NOT EXISTS ix_books_title_pattern ON books (title text_pattern_ops)",
+    ],
+}
+
+# Search indexes: trigram GIN indexes on PostgreSQL, an FTS5 trigram table kept in sync by triggers on SQLite
+SEARCH_DDL = {
+    "postgresql": [
+        "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+        "CREATE INDEX IF NOT EXISTS ix_books_title_trgm ON books USING gin (title gin_trgm_ops)",
+        "CREATE INDEX IF NOT EXISTS ix_authors_name_trgm ON authors USING gin (name gin_trgm_ops)",
+    ],
+    "sqlite": [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS books_search USING fts5(title, author, tokenize='trigram')",
+        """CREATE TRIGGER IF NOT EXISTS books_search_insert AFTER INSERT ON books BEGIN
+            INSERT INTO books_search (rowid, title, author)
+            SELECT NEW.id, NEW.title, authors.name FROM authors WHERE authors.id = NEW.author_id;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS books_search_update AFTER UPDATE OF title, author_id ON books BEGIN
+            DELETE FROM books_search WHERE rowid = OLD.id;
+            INSERT INTO books_search (rowid, title, author)
+            SELECT NEW.id, NEW.title, authors.name FROM authors WHERE authors.id = NEW.author_id;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS books_search_delete AFTER DELETE ON books BEGIN
+            DELETE FROM books_search WHERE rowid = OLD.id;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS books_search_author_rename AFTER UPDATE OF name ON authors BEGIN
+            UPDATE books_search SET author = NEW.name
+            WHERE rowid IN (SELECT id FROM books WHERE author_id = NEW.id);
+        END""",
+    ],
+}
+
+# books.author_name mirrors authors.name: filled on insert or author change, rewritten on author rename
+AUTHOR_NAME_DDL = {
+    "postgresql": [
+        """CREATE OR REPLACE FUNCTION books_set_author_name() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'UPDATE' OR NEW.author_name IS NULL THEN
+                SELECT name INTO NEW.author_name FROM authors WHERE id = NEW.author_id;
+            END IF;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql""",
+        """CREATE TRIGGER books_set_author_name BEFORE INSERT OR UPDATE OF author_id ON books
+        FOR EACH ROW EXECUTE FUNCTION books_set_author_name()""",
+        """CREATE OR REPLACE FUNCTION authors_propagate_name() RETURNS trigger AS $$
+        BEGIN
+            UPDATE books SET author_name = NEW.name WHERE author_id = NEW.id;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql""",
+        """CREATE TRIGGER authors_propagate_name AFTER UPDATE OF name ON authors
+        FOR EACH ROW WHEN (NEW.name IS DISTINCT FROM OLD.name) EXECUTE FUNCTION authors_propagate_name()""",
+    ],
+    "sqlite": [
+        """CREATE TRIGGER IF NOT EXISTS books_author_name_insert AFTER INSERT ON books
+        WHEN NEW.author_name IS NULL BEGIN
+            UPDATE books SET author_name = (SELECT name FROM authors WHERE id = NEW.author_id) WHERE id = NEW.id;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS books_author_name_update AFTER UPDATE OF author_id ON books
+        WHEN NEW.author_name IS NOT (SELECT name FROM authors WHERE id = NEW.author_id) BEGIN
+            UPDATE books SET author_name = (SELECT name FROM authors WHERE id = NEW.author_id) WHERE id = NEW.id;
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS authors_propagate_name AFTER UPDATE OF name ON authors BEGIN
+            UPDATE books SET author_name = NEW.name WHERE author_id = NEW.id;
+        END""",
+    ],
+}
+
+# Writers take a transaction-level lock before logging, so sequence numbers are handed out in commit order and a
+# mirror never stores a position past a change that is still uncommitted. SQLite already admits one writer at a time.
+CHANGE_LOG_LOCK_ID = 1651469163
+
+# Every write to books appends to book_changes; PostgreSQL logs whole statements at once through transition tables
+CHANGE_LOG_DDL = {
+    "postgresql": [
+        f"""CREATE OR REPLACE FUNCTION books_record_changes() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_advisory_xact_lock({CHANGE_LOG_LOCK_ID});
+            INSERT INTO book_changes (book_id, op) SELECT id, TG_ARGV[0] FROM changed ORDER BY id;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql""",
+        """CREATE TRIGGER books_record_insert AFTER INSERT ON books REFERENCING NEW TABLE AS changed
+        FOR EACH STATEMENT EXECUTE FUNCTION books_record_changes('insert')""",
+        """CREATE TRIGGER books_record_update AFTER UPDATE ON books REFERENCING NEW TABLE AS changed
+        FOR EACH STATEMENT EXECUTE FUNCTION books_record_changes('update')""",
+        """CREATE TRIGGER books_record_delete AFTER DELETE ON books REFERENCING OLD TABLE AS changed
+        FOR EACH STATEMENT EXECUTE FUNCTION books_record_changes('delete')""",
+    ],
+    "sqlite": [
+        """CREATE TRIGGER IF NOT EXISTS books_record_insert AFTER INSERT ON books BEGIN
+            INSERT INTO book_changes (book_id, op) VALUES (NEW.id, 'insert');
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS books_record_update AFTER UPDATE ON books BEGIN
+            INSERT INTO book_changes (book_id, op) VALUES (NEW.id, 'update');
+        END""",
+        """CREATE TRIGGER IF NOT EXISTS books_record_delete AFTER DELETE ON books BEGIN
+            INSERT INTO book_changes (book_id, op) VALUES (OLD.id, 'delete');
+        END""",
+    ],
+}
+
+for dialect, statements in CHANGE_LOG_DDL.items():
+    for statement in statements:
+        event.listen(Book.__table__, "after_create", DDL(statement).execute_if(dialect=dialect))
+
+for dialect, statements in AUTHOR_NAME_DDL.items():
+    for statement in statements:
+        event.listen(Book.__table__, "after_create", DDL(statement).execute_if(dialect=dialect))
+
+for dialect, statements in PREFIX_DDL.items():
+    for statement in statements:
+        event.listen(Book.__table__, "after_create", DDL(statement).execute_if(dialect=dialect))
+
+for dialect, statements in SEARCH_DDL.items():
+    for statement in statements:
+        event.listen(Book.__table__, "after_create", DDL(statement).execute_if(dialect=dialect))
+
+event.listen(Book.__table__, "before_drop", DDL("DROP TABLE IF EXISTS books_search").execute_if(dialect="sqlite"))
@@ -3,7 +3,7 @@ from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from app.core.database import get_db
-from app.core.security import hash_password, verify_password, create_access_token
+from app.core.security import hash_password_async, verify_password_async, create_access_token
 from app.models.user import User
 from app.schemas.user import UserCreate
 
@@ -34,7 +34,8 @@ async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
     if existing_user_by_email:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Email already registered")
 
-    user_in_db = User(username=user.username, email=user.email, hashed_password=hash_password(user.password))
+    hashed_password = await hash_password_async(user.password)
+    user_in_db = User(username=user.username, email=user.email, hashed_password=hashed_password)
     db.add(user_in_db)
     try:
         await db.commit()
@@ -49,7 +50,7 @@ async def register(user: UserCreate, db: AsyncSession = Depends(get_db)):
 async def login(request: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
     user_in_db = await get_user_by_username(db, username=request.username)
 
-    if not user_in_db or not verify_password(request.password, user_in_db.hashed_password):
+    if not user_in_db or not await verify_password_async(request.password, user_in_db.hashed_password):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid username or password")
 
     access_token = create_access_token(data={"sub": user_in_db.username})
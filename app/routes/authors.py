@@ -0,0 +1,35 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, Query, Response
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
+from app.core.database import get_read_db
+from app.crud.raw_sql_crud import get_authors, get_author_by_id
+from app.schemas.author import AuthorPage, AuthorPageRow, AuthorWithBooks, AuthorWithBooksRow
+
+router = APIRouter()
+
+AUTHOR_ADAPTER = TypeAdapter(AuthorWithBooksRow)
+AUTHOR_PAGE_ADAPTER = TypeAdapter(AuthorPageRow)
+
+
+@router.get("/", response_model=AuthorPage)
+async def list_authors(
+        db: AsyncSession = Depends(get_read_db),
+        name_prefix: Optional[str] = Query(None, description="Filter by author name prefix"),
+        page_size: int = Query(10, description="Number of authors per page"),
+        cursor: Optional[str] = Query(None, description="Opaque cursor returned as next_cursor by the previous page"),
+        books_limit: int = Query(settings.AUTHOR_BOOKS_LIMIT, description="Maximum number of books per author")
+):
+    authors_page = await get_authors(db, name_prefix, page_size, cursor, books_limit)
+    return Response(AUTHOR_PAGE_ADAPTER.dump_json(authors_page), media_type="application/json")
+
+
+@router.get("/{author_id}", response_model=AuthorWithBooks)
+async def fetch_author(
+        author_id: int,
+        db: AsyncSession = Depends(get_read_db),
+        books_limit: int = Query(settings.AUTHOR_BOOKS_LIMIT, description="Maximum number of books to include")
+):
+    author = await get_author_by_id(db, author_id, books_limit)
+    return Response(AUTHOR_ADAPTER.dump_json(author), media_type="application/json")
@@ -1,15 +1,95 @@
-from fastapi import APIRouter, Depends, UploadFile, File, Query
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from pydantic import TypeAdapter
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Optional
-from app.core.database import get_db
+from typing import List, Optional, Union
+from app.core.cache import book_cache
+from app.core.database import get_db, get_read_db, get_read_session_factory, get_session_factory
+from app.core.jobs import Job, job_runner
 from app.core.permissions import Permissions
 from app.crud.raw_sql_crud import (
-    create_book, update_book, get_books, get_book_by_id, delete_book, bulk_import_books
+    create_book, update_book, get_books, get_books_by_cursor, get_book_by_id, delete_book, bulk_import_books,
+    create_books, update_books, delete_books, stream_books, search_books, count_books, stream_book_changes,
+    IMPORT_MODES
 )
-from app.schemas.book import BookCreate, BookUpdate, BookResponse
+from app.crud.book_io import READ_BLOCK_SIZE, detect_format, encode_changes, encode_csv, encode_ndjson
+from app.schemas.book import (
+    BookCreate, BookUpdate, BookResponse, BookPage, BookBatchUpdate, BookBatchDelete, BookBatchResult,
+    BookSearchResult, BookRow, BookSearchRow, BookPageRow
+)
+from app.schemas.job import JobResponse
 
 router = APIRouter()
 
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", encode_ndjson),
+    "csv": ("text/csv", encode_csv),
+}
+
+# Rows from raw_sql_crud are trusted, so read endpoints serialize them directly instead of validating into models
+BOOK_ADAPTER = TypeAdapter(BookRow)
+BOOK_LIST_ADAPTER = TypeAdapter(List[BookRow])
+BOOK_PAGE_ADAPTER = TypeAdapter(BookPageRow)
+SEARCH_RESULTS_ADAPTER = TypeAdapter(List[BookSearchRow])
+
+
+def _updated_at(book: dict) -> datetime:
+    updated_at = book["updated_at"]
+    if isinstance(updated_at, str):
+        updated_at = datetime.fromisoformat(updated_at)
+    if updated_at.tzinfo is None:
+        updated_at = updated_at.replace(tzinfo=timezone.utc)
+    return updated_at.replace(microsecond=0)
+
+
+def _is_not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            return last_modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+
+    return False
+
+
+def _conditional_response(request: Request, response: Response, books: List[dict], *extra: str,
+                          collection: bool = True):
+    source = "|".join([f"{book['id']}:{book['version']}:{book['updated_at']}" for book in books] + list(extra))
+    etag = f'"{hashlib.sha1(source.encode()).hexdigest()}"'
+    # A listing's newest updated_at does not move when rows are deleted or drop out of the filter,
+    # so collections are validated by ETag alone.
+    last_modified = None if collection else max((_updated_at(book) for book in books), default=None)
+
+    headers = {"ETag": etag}
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+    if _is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return None
+
+
+def _json_response(response: Response, adapter: TypeAdapter, content) -> Response:
+    headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+    return Response(adapter.dump_json(content), media_type="application/json", headers=headers)
+
 
 @router.post("/", response_model=BookResponse)
 async def add_book(
@@ -20,55 +100,215 @@ async def add_book(
     return await create_book(db, book)
 
 
-@router.get("/{book_id}", response_model=BookResponse)
-async def fetch_book(book_id: int, db: AsyncSession = Depends(get_db)):
-    return await get_book_by_id(db, book_id)
+@router.post("/batch", response_model=List[BookBatchResult])
+async def add_books(
+    books: List[BookCreate],
+    db: AsyncSession = Depends(get_db),
+    current_user: str = Depends(Permissions.is_authenticated)
+):
+    return await create_books(db, books)
 
 
-@router.put("/{book_id}", response_model=BookResponse)
-async def modify_book(
-    book_id: int,
-    book: BookUpdate,
+@router.patch("/batch", response_model=List[BookBatchResult])
+async def modify_books(
+    books: List[BookBatchUpdate],
     db: AsyncSession = Depends(get_db),
     current_user: str = Depends(Permissions.is_authenticated)
 ):
-    return await update_book(db, book_id, book)
+    return await update_books(db, books)
 
 
-@router.delete("/{book_id}")
-async def remove_book(
-    book_id: int,
+@router.delete("/batch", response_model=List[BookBatchResult])
+async def remove_books(
+    batch: BookBatchDelete,
     db: AsyncSession = Depends(get_db),
     current_user: str = Depends(Permissions.is_authenticated)
 ):
-    return await delete_book(db, book_id)
+    return await delete_books(db, batch.ids)
 
 
-@router.get("/", response_model=List[BookResponse])
-async def list_books(
-        db: AsyncSession = Depends(get_db),
+def book_filters(
         title: Optional[str] = Query(None, description="Filter by book title"),
+        title_prefix: Optional[str] = Query(None, description="Filter by book title prefix"),
         author_id: Optional[int] = Query(None, description="Filter by author ID"),
-        genre: Optional[str] = Query(None, description="Filter by genre"),
+        genre: Optional[List[str]] = Query(None, description="Filter by genre (repeat to match any of several)"),
         min_year: Optional[int] = Query(None, description="Filter by minimum published year"),
-        max_year: Optional[int] = Query(None, description="Filter by maximum published year"),
+        max_year: Optional[int] = Query(None, description="Filter by maximum published year")
+) -> dict:
+    return {"title": title, "title__prefix": title_prefix, "author_id": author_id, "genre__in": genre,
+            "published_year__gte": min_year, "published_year__lte": max_year}
+
+
+@router.get("/search", response_model=List[BookSearchResult])
+async def find_books(
+        q: str = Query(..., description="Text to match against book titles and author names"),
+        limit: int = Query(10, description="Maximum number of results"),
+        db: AsyncSession = Depends(get_read_db)
+):
+    return Response(SEARCH_RESULTS_ADAPTER.dump_json(await search_books(db, q, limit)), media_type="application/json")
+
+
+@router.get("/export")
+async def export_books(
+        format: str = Query("ndjson", description="Export format ('ndjson' or 'csv')"),
+        filters: dict = Depends(book_filters),
+        session_factory=Depends(get_read_session_factory)
+):
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Invalid export format: {format}")
+    media_type, encode = EXPORT_FORMATS[format]
+
+    async def content():
+        async with session_factory() as session:
+            async for chunk in encode(stream_books(session, filters)):
+                yield chunk
+
+    return StreamingResponse(
+        content(), media_type=media_type, headers={"Content-Disposition": f'attachment; filename="books.{format}"'}
+    )
+
+
+@router.get("/changes")
+async def book_changes(
+        since: int = Query(0, description="Last change sequence already applied by the client"),
+        limit: Optional[int] = Query(None, description="Maximum number of changes to return"),
+        session_factory=Depends(get_read_session_factory)
+):
+    if since < 0:
+        raise HTTPException(status_code=400, detail="Change sequence must not be negative")
+    if limit is not None and limit < 1:
+        raise HTTPException(status_code=400, detail="Limit must be a positive integer")
+
+    async def content():
+        async with session_factory() as session:
+            async for chunk in encode_changes(stream_book_changes(session, since, limit)):
+                yield chunk
+
+    return StreamingResponse(content(), media_type="application/x-ndjson")
+
+
+@router.get("/", response_model=Union[List[BookResponse], BookPage])
+async def list_books(
+        request: Request,
+        response: Response,
+        db: AsyncSession = Depends(get_read_db),
+        filters: dict = Depends(book_filters),
         sort_by: Optional[str] = Query("title", description="Sort field"),
         sort_order: Optional[str] = Query("asc", description="Sort order ('asc' or 'desc')"),
         page: int = Query(1, description="Page number"),
-        page_size: int = Query(10, description="Number of items per page")
+        page_size: int = Query(10, description="Number of items per page"),
+        pagination: str = Query("offset", description="Pagination mode ('offset' or 'cursor')"),
+        cursor: Optional[str] = Query(None, description="Opaque cursor returned as next_cursor by the previous page"),
+        include_total: bool = Query(False, description="Include the total number of matching books"),
+        facets: bool = Query(False, description="Include counts by genre, published decade and author"),
+        count: str = Query("exact", description="Total count mode ('exact' or 'approximate'); facets are always exact, "
+                                                "so 'approximate' cannot be combined with facets")
 ):
-    filters = {"title": title, "author_id": author_id, "genre": genre, "published_year__gte": min_year,
-               "published_year__lte": max_year}
-    return await get_books(db, filters, sort_by, sort_order, page, page_size)
+    if pagination not in {"offset", "cursor"}:
+        raise HTTPException(status_code=400, detail=f"Invalid pagination mode: {pagination}")
+    if count not in {"exact", "approximate"}:
+        raise HTTPException(status_code=400, detail=f"Invalid count mode: {count}")
+    if facets and count == "approximate":
+        raise HTTPException(status_code=400, detail="Approximate counts cannot be combined with facets")
+
+    use_cursor = pagination == "cursor" or bool(cursor)
+    with_counts = include_total or facets
+    params = {**filters, "sort_by": sort_by, "sort_order": sort_order, "page_size": page_size,
+              "page": None if use_cursor else page, "cursor": cursor, "include_total": include_total,
+              "facets": facets, "count": count}
+
+    async def load_page():
+        if use_cursor:
+            books_page = await get_books_by_cursor(db, filters, sort_by, sort_order, page_size, cursor)
+        else:
+            books_page = {"items": await get_books(db, filters, sort_by, sort_order, page, page_size)}
+        if with_counts:
+            books_page.update(await count_books(db, filters, with_facets=facets, approximate=count == "approximate"))
+        return books_page
+
+    books_page = await book_cache.get_books(params, load_page)
+    if not use_cursor and not with_counts:
+        return (_conditional_response(request, response, books_page["items"])
+                or _json_response(response, BOOK_LIST_ADAPTER, books_page["items"]))
+
+    page_summary = json.dumps({key: value for key, value in books_page.items() if key != "items"}, sort_keys=True)
+    books_page = {"next_cursor": None, "total": None, "total_is_estimate": False, "facets": None, **books_page}
+    return (_conditional_response(request, response, books_page["items"], page_summary)
+            or _json_response(response, BOOK_PAGE_ADAPTER, books_page))
 
 
-@router.post("/bulk-import")
+async def run_import_job(job: Job):
+    async with get_session_factory()() as db:
+        try:
+            return await bulk_import_books(
+                db, job.payload["path"], job.payload["format"],
+                progress=lambda stats: job_runner.report_progress(job, stats),
+                mode=job.payload.get("mode", "insert")
+            )
+        except UnicodeDecodeError:
+            raise HTTPException(status_code=400, detail="File must be UTF-8 encoded")
+
+
+def remove_import_file(job: Job):
+    with contextlib.suppress(FileNotFoundError):
+        os.unlink(job.payload["path"])
+
+
+job_runner.register("import_books", run_import_job, remove_import_file)
+
+
+def _spool_upload(source, suffix: str) -> str:
+    with tempfile.NamedTemporaryFile("wb", prefix="book-import-", suffix=suffix, delete=False) as target:
+        shutil.copyfileobj(source, target, READ_BLOCK_SIZE)
+        return target.name
+
+
+@router.post("/bulk-import", status_code=202, response_model=JobResponse)
 async def import_books(
+    response: Response,
     file: UploadFile = File(...),
+    mode: str = Query("insert", description="'insert' skips books that already exist, 'upsert' updates changed ones"),
+    current_user: str = Depends(Permissions.is_authenticated)
+):
+    if mode not in IMPORT_MODES:
+        raise HTTPException(status_code=400, detail=f"Invalid import mode: {mode}")
+    file_format = detect_format(file.filename)
+    await file.seek(0)
+    # The worker reads its own copy, so this request returns without holding the upload or a pooled connection
+    path = await run_in_threadpool(_spool_upload, file.file, os.path.splitext(file.filename)[1])
+    payload = {"path": path, "format": file_format, "filename": file.filename, "mode": mode}
+    try:
+        job = await job_runner.submit("import_books", payload, current_user)
+    except Exception:
+        os.unlink(path)
+        raise
+
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return job.to_dict()
+
+
+# Declared last so the /{book_id} pattern cannot shadow static paths such as /export
+@router.get("/{book_id}", response_model=BookResponse)
+async def fetch_book(book_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_read_db)):
+    book = await book_cache.get_book(book_id, lambda: get_book_by_id(db, book_id))
+    return (_conditional_response(request, response, [book], collection=False)
+            or _json_response(response, BOOK_ADAPTER, book))
+
+
+@router.put("/{book_id}", response_model=BookResponse)
+async def modify_book(
+    book_id: int,
+    book: BookUpdate,
     db: AsyncSession = Depends(get_db),
     current_user: str = Depends(Permissions.is_authenticated)
 ):
-    file_path = f"/tmp/{file.filename}"
-    with open(file_path, "wb") as f:
-        f.write(await file.read())
-    return await bulk_import_books(db, file_path)
+    return await update_book(db, book_id, book)
+
+
+@router.delete("/{book_id}")
+async def remove_book(
+    book_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: str = Depends(Permissions.is_authenticated)
+):
+    return await delete_book(db, book_id)
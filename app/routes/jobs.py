@@ -0,0 +1,14 @@
+from fastapi import APIRouter, Depends, HTTPException
+from app.core.jobs import job_runner
+from app.core.permissions import Permissions
+from app.schemas.job import JobResponse
+
+router = APIRouter()
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str, current_user: str = Depends(Permissions.is_authenticated)):
+    job = await job_runner.get(job_id)
+    if job is None or job.owner != current_user:
+        raise HTTPException(status_code=404, detail=f"Job with ID {job_id} not found")
+    return job.to_dict()
@@ -0,0 +1,31 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from app.core import metrics
+from app.core.cache import author_cache, book_cache, count_cache
+from app.core.database import created_engines, pool_stats
+from app.core.jobs import job_runner
+from app.core.security import password_hasher, token_cache
+from app.crud.query_registry import queries
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def read_metrics():
+    engines = created_engines()
+    engine, read_engine = engines.get("primary"), engines.get("replica")
+    lines = [metrics.render()]
+    for name, stats in [
+        ("app_startup", metrics.startup_timings),
+        ("book_cache", book_cache.stats()),
+        ("author_cache", author_cache.stats()),
+        ("count_cache", count_cache.stats()),
+        ("token_cache", token_cache.stats()),
+        ("password_hasher", password_hasher.stats()),
+        ("jobs", job_runner.stats()),
+        ("query_registry", queries.stats()),
+        ("db_pool", pool_stats(engine) if engine else {}),
+        ("db_read_pool", pool_stats(read_engine) if read_engine and read_engine is not engine else {}),
+    ]:
+        lines += metrics.render_stats(name, stats)
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
@@ -1,3 +1,5 @@
+from typing import List, Optional
+from typing_extensions import TypedDict
 from pydantic import BaseModel
 
 
@@ -13,4 +15,41 @@ class AuthorResponse(AuthorBase):
     id: int
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+
+class AuthorBook(BaseModel):
+    id: int
+    title: str
+    genre: str
+    published_year: int
+
+
+class AuthorWithBooks(AuthorResponse):
+    book_count: int
+    books: List[AuthorBook]
+
+
+class AuthorPage(BaseModel):
+    items: List[AuthorWithBooks]
+    next_cursor: Optional[str] = None
+
+
+# Serialization-only shapes for rows that come straight from the database and need no validation
+class AuthorBookRow(TypedDict):
+    id: int
+    title: str
+    genre: str
+    published_year: int
+
+
+class AuthorWithBooksRow(TypedDict):
+    id: int
+    name: str
+    book_count: int
+    books: List[AuthorBookRow]
+
+
+class AuthorPageRow(TypedDict):
+    items: List[AuthorWithBooksRow]
+    next_cursor: Optional[str]
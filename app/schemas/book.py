@@ -1,4 +1,5 @@
-from typing import Optional
+from typing import Dict, List, Optional, Union
+from typing_extensions import TypedDict
 from pydantic import BaseModel, Field
 from app.schemas.author import AuthorResponse
 from app.core.config import settings
@@ -41,3 +42,67 @@ class BookResponse(BookBase):
 
     class Config:
         from_attributes = True
+
+
+class FacetCount(BaseModel):
+    value: Union[int, str]
+    count: int
+
+
+class BookPage(BaseModel):
+    items: List[BookResponse]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+    total_is_estimate: bool = False
+    facets: Optional[Dict[str, List[FacetCount]]] = None
+
+
+class BookSearchResult(BookResponse):
+    score: float
+
+
+class BookBatchUpdate(BookUpdate):
+    id: int
+
+
+class BookBatchDelete(BaseModel):
+    ids: List[int]
+
+
+class BookBatchResult(BaseModel):
+    index: int
+    id: Optional[int] = None
+    status: str
+    detail: Optional[str] = None
+    book: Optional[BookResponse] = None
+
+
+# Serialization-only shapes for rows that come straight from the database and need no validation
+class AuthorRow(TypedDict):
+    id: int
+    name: str
+
+
+class BookRow(TypedDict):
+    id: int
+    title: str
+    genre: str
+    published_year: int
+    author: AuthorRow
+
+
+class BookSearchRow(BookRow):
+    score: float
+
+
+class FacetRow(TypedDict):
+    value: Union[int, str]
+    count: int
+
+
+class BookPageRow(TypedDict):
+    items: List[BookRow]
+    next_cursor: Optional[str]
+    total: Optional[int]
+    total_is_estimate: bool
+    facets: Optional[Dict[str, List[FacetRow]]]
@@ -0,0 +1,16 @@
+from datetime import datetime
+from typing import Any, Dict, Optional
+from pydantic import BaseModel
+
+
+class JobResponse(BaseModel):
+    id: str
+    kind: str
+    status: str
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    progress: Dict[str, int] = {}
+    rows_per_second: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
@@ -0,0 +1,42 @@
+import os
+import shutil
+import tempfile
+import uvicorn
+from app.core.config import settings
+
+
+def main():
+    workers = settings.WEB_CONCURRENCY or os.cpu_count() or 1
+    if settings.DB_MAX_CONNECTIONS and settings.DB_MAX_CONNECTIONS < workers:
+        raise SystemExit(f"DB_MAX_CONNECTIONS={settings.DB_MAX_CONNECTIONS} cannot give each of {workers} workers "
+                         f"a connection")
+
+    # Workers are spawned fresh and read their settings from the environment: pools are sized for this many workers
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    if settings.DB_SCHEMA_MODE == "check" and not settings.DB_SCHEMA_REVISION:
+        from app.core.database import alembic_heads
+        heads = alembic_heads()
+        if len(heads) == 1:
+            # Resolved once here so workers check the schema without loading Alembic themselves
+            os.environ["DB_SCHEMA_REVISION"] = next(iter(heads))
+
+    state_dir = None
+    if workers > 1 and not settings.JOB_STATE_DIR:
+        # Job state is published to a directory so every worker can answer GET /jobs/{id}
+        state_dir = os.environ["JOB_STATE_DIR"] = tempfile.mkdtemp(prefix="book-jobs-")
+
+    try:
+        uvicorn.run(
+            "app.main:app",
+            host=settings.SERVER_HOST,
+            port=settings.SERVER_PORT,
+            workers=workers,
+            timeout_graceful_shutdown=settings.SERVER_GRACEFUL_TIMEOUT,
+        )
+    finally:
+        if state_dir:
+            shutil.rmtree(state_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
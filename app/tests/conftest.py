@@ -3,14 +3,26 @@ from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 
 from app.main import app
-from app.core.database import Base, get_db
+from app.core.cache import author_cache, book_cache, count_cache
+from app.core.jobs import job_runner
+from app.core.database import Base, get_db, get_read_db
 from app.models import user, author, book
+from benchmarks.common import ASGIClient
 
 TEST_DATABASE_URL="sqlite+aiosqlite:///:memory:"
 test_engine = create_async_engine(TEST_DATABASE_URL, echo=True, future=True)
 TestingSessionLocal = sessionmaker(bind=test_engine, class_=AsyncSession, expire_on_commit=False)
 
 
+@pytest.fixture(autouse=True)
+async def clear_caches():
+    await book_cache.clear()
+    author_cache.clear()
+    count_cache.clear()
+    yield
+    await job_runner.stop()
+
+
 @pytest.fixture(scope="function")
 async def test_db_session():
     async with test_engine.begin() as conn:
@@ -31,5 +43,14 @@ async def override_get_db(test_db_session):
         yield test_db_session
 
     app.dependency_overrides[get_db] = _get_db
+    app.dependency_overrides[get_read_db] = _get_db
     yield
-    app.dependency_overrides.clear()
\ No newline at end of file
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def call_app():
+    async def call(method: str, path: str, params: dict = None, headers: dict = None, json_body=None, asgi_app=app):
+        return await ASGIClient(asgi_app, headers).exchange(method, path, params, json_body)
+
+    return call
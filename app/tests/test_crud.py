@@ -1,7 +1,10 @@
 import pytest
+import base64
+import io
 import json
-from sqlalchemy import text
-from app.schemas.book import BookCreate, BookUpdate
+from fastapi import HTTPException
+from sqlalchemy import event, text
+from app.schemas.book import BookCreate, BookUpdate, BookBatchUpdate
 from app.crud.raw_sql_crud import (
     validate_or_create_author,
     create_book,
@@ -9,8 +12,22 @@ from app.crud.raw_sql_crud import (
     update_book,
     delete_book,
     get_books,
+    get_books_by_cursor,
+    decode_cursor,
     bulk_import_books,
+    create_books,
+    update_books,
+    delete_books,
+    search_books,
+    get_authors,
+    get_author_by_id,
+    count_books,
+    DUPLICATE_BOOK_DETAIL,
 )
+from app.crud.book_io import iter_json_array
+from app.crud.query_registry import queries
+from app.core.cache import author_cache
+from app.core.config import settings
 
 
 @pytest.mark.asyncio
@@ -105,3 +122,326 @@ async def test_bulk_import_books_json(test_db_session, tmp_path):
     response = await bulk_import_books(test_db_session, str(file_path))
 
     assert response["message"] == "Successfully imported 2 books"
+
+
+@pytest.mark.asyncio
+async def test_bulk_import_books_csv_in_chunks(test_db_session, tmp_path):
+    file_path = tmp_path / "books.csv"
+    rows = ["title,genre,published_year,author"]
+    rows += [f"Book {i},Fiction,{2000 + i},Author {i % 3}" for i in range(7)]
+    file_path.write_text("\n".join(rows) + "\n")
+
+    progress = []
+    response = await bulk_import_books(test_db_session, str(file_path), chunk_size=3, commit_every=3,
+                                       progress=progress.append)
+
+    assert response["imported"] == 7
+    assert [report["processed"] for report in progress] == [3, 6, 7]
+
+    result = await test_db_session.execute(text("SELECT COUNT(*) FROM authors"))
+    assert result.scalar() == 3
+
+
+@pytest.mark.asyncio
+async def test_bulk_import_books_reports_row_errors(test_db_session, tmp_path):
+    file_path = tmp_path / "books.json"
+    books_data = [
+        {"title": "Book 1", "genre": "Fantasy", "published_year": 2020, "author": "Author 1"},
+        {"title": "", "genre": "Fantasy", "published_year": 2020, "author": "Author 1"},
+        {"title": "Book 3", "genre": "Fantasy", "published_year": "unknown", "author": "Author 2"},
+    ]
+    file_path.write_text(json.dumps(books_data))
+
+    response = await bulk_import_books(test_db_session, str(file_path))
+
+    assert response["imported"] == 1
+    assert response["failed"] == 2
+    assert [error["row"] for error in response["errors"]] == [2, 3]
+
+
+@pytest.mark.asyncio
+async def test_bulk_import_books_upsert_only_writes_changes(test_db_session, tmp_path):
+    file_path = tmp_path / "books.csv"
+    file_path.write_text("title,genre,published_year,author\n" + "".join(
+        f"Book {i},Fiction,{2000 + i},Author {i}\n" for i in range(4)
+    ))
+    response = await bulk_import_books(test_db_session, str(file_path), mode="upsert")
+    assert (response["inserted"], response["updated"], response["unchanged"]) == (4, 0, 0)
+
+    file_path.write_text("title,genre,published_year,author\n" + "".join(
+        f"Book {i},{'Fantasy' if i == 1 else 'Fiction'},{2000 + i},Author {i}\n" for i in range(5)
+    ))
+    response = await bulk_import_books(test_db_session, str(file_path), mode="upsert")
+    assert (response["inserted"], response["updated"], response["unchanged"]) == (1, 1, 3)
+
+    response = await bulk_import_books(test_db_session, str(file_path))
+    assert (response["imported"], response["unchanged"]) == (0, 5)
+
+    result = await test_db_session.execute(text("SELECT title, genre, version FROM books ORDER BY title"))
+    assert [tuple(row) for row in result.fetchall()] == [
+        ("Book 0", "Fiction", 1), ("Book 1", "Fantasy", 2), ("Book 2", "Fiction", 1),
+        ("Book 3", "Fiction", 1), ("Book 4", "Fiction", 1)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_create_book_rejects_duplicate_natural_key(test_db_session):
+    book = BookCreate(title="Dune", genre="Fiction", published_year=1965, author="Frank Herbert")
+    await create_book(test_db_session, book)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await create_book(test_db_session, book)
+    assert exc_info.value.status_code == 409
+
+    results = await create_books(test_db_session, [book, book.model_copy(update={"published_year": 1966})])
+    assert [result["status"] for result in results] == ["conflict", "created"]
+
+
+def test_iter_json_array_small_blocks():
+    books_data = [{"title": f"Book {i}", "published_year": 1900 + i} for i in range(5)]
+    stream = io.StringIO(json.dumps(books_data, indent=2))
+
+    assert list(iter_json_array(stream, block_size=7)) == books_data
+
+
+def test_iter_json_array_rejects_malformed_item_without_reading_the_rest():
+    books_data = [{"title": f"Book {i}", "published_year": 1900 + i} for i in range(1000)]
+    stream = io.StringIO('[{"title": "Broken" "genre"}, ' + json.dumps(books_data)[1:])
+
+    with pytest.raises(HTTPException) as exc_info:
+        list(iter_json_array(stream, block_size=16, max_item_size=256))
+
+    assert exc_info.value.status_code == 400
+    assert stream.tell() < 512
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("sort_by,sort_order", [("title", "asc"), ("genre", "desc"), ("published_year", "asc")])
+async def test_get_books_by_cursor_walks_all_books(test_db_session, sort_by, sort_order):
+    for i in range(5):
+        await create_book(test_db_session, BookCreate(
+            title=f"Book {i % 2}", genre=["Fiction", "History"][i % 2], published_year=2000 + i % 3, author="Author"
+        ))
+
+    seen, cursor = [], None
+    while True:
+        page = await get_books_by_cursor(test_db_session, {}, sort_by, sort_order, page_size=2, cursor=cursor)
+        seen.extend(book["id"] for book in page["items"])
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+
+    offset_books = await get_books(test_db_session, {}, sort_by, sort_order, page_size=10)
+    assert seen == [book["id"] for book in offset_books]
+
+
+@pytest.mark.parametrize("payload", [
+    ["published_year", "asc", "1999", 1],
+    ["published_year", "asc", True, 1],
+    ["published_year", "asc", 1999, "1"],
+    {"sort_by": "published_year"},
+])
+def test_decode_cursor_rejects_mistyped_payload(payload):
+    cursor = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+    with pytest.raises(HTTPException) as exc_info:
+        decode_cursor(cursor, "published_year", "asc")
+    assert exc_info.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_get_books_filter_operators(test_db_session):
+    for title, genre, year in [("Dune", "Fiction", 1965), ("Dune Messiah", "Fiction", 1969),
+                               ("Cosmos", "Science", 1980), ("SPQR", "History", 2015)]:
+        await create_book(test_db_session, BookCreate(title=title, genre=genre, published_year=year, author="Author"))
+
+    async def titles(filters):
+        return [book["title"] for book in await get_books(test_db_session, filters)]
+
+    assert await titles({"published_year__gte": 1966, "published_year__lte": 2000}) == ["Cosmos", "Dune Messiah"]
+    assert await titles({"genre__in": ["Science", "History"]}) == ["Cosmos", "SPQR"]
+    assert await titles({"title__prefix": "Dune"}) == ["Dune", "Dune Messiah"]
+    assert await titles({"title__prefix": "Dune%"}) == []
+
+
+@pytest.mark.asyncio
+async def test_get_books_rejects_unknown_filter(test_db_session):
+    with pytest.raises(HTTPException) as exc_info:
+        await get_books(test_db_session, {"title__contains": "Dune"})
+
+    assert exc_info.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_create_book_reuses_cached_author(test_db_session):
+    first = await create_book(test_db_session, BookCreate(title="Dune", genre="Fiction", published_year=1965,
+                                                          author="Frank Herbert"))
+    hits = author_cache.hits
+    second = await create_book(test_db_session, BookCreate(title="Dune Messiah", genre="Fiction",
+                                                           published_year=1969, author="Frank Herbert"))
+
+    assert author_cache.hits == hits + 1
+    assert second["author"]["id"] == first["author"]["id"]
+    result = await test_db_session.execute(text("SELECT COUNT(*) FROM authors"))
+    assert result.scalar() == 1
+
+
+@pytest.mark.asyncio
+async def test_validate_or_create_author_does_not_commit(test_db_session):
+    await validate_or_create_author(test_db_session, "Uncommitted Author")
+    await test_db_session.rollback()
+
+    result = await test_db_session.execute(text("SELECT COUNT(*) FROM authors"))
+    assert result.scalar() == 0
+    assert author_cache.get("Uncommitted Author") is None
+
+
+@pytest.mark.asyncio
+async def test_batch_create_update_delete(test_db_session):
+    created = await create_books(test_db_session, [
+        BookCreate(title="Dune", genre="Fiction", published_year=1965, author="Frank Herbert"),
+        BookCreate(title=" ", genre="Fiction", published_year=1965, author="Frank Herbert"),
+        BookCreate(title="Cosmos", genre="Science", published_year=1980, author="Carl Sagan"),
+    ])
+    assert [result["status"] for result in created] == ["created", "error", "created"]
+    assert created[2]["book"]["author"]["name"] == "Carl Sagan"
+    dune_id, cosmos_id = created[0]["id"], created[2]["id"]
+
+    updated = await update_books(test_db_session, [
+        BookBatchUpdate(id=dune_id, title="Dune Messiah", published_year=1969),
+        BookBatchUpdate(id=cosmos_id, author="Ann Druyan"),
+        BookBatchUpdate(id=9999, genre="History"),
+    ])
+    assert [result["status"] for result in updated] == ["updated", "updated", "not_found"]
+    assert updated[0]["book"]["title"] == "Dune Messiah"
+    assert updated[0]["book"]["published_year"] == 1969
+    assert updated[1]["book"]["title"] == "Cosmos"
+    assert updated[1]["book"]["author"]["name"] == "Ann Druyan"
+
+    deleted = await delete_books(test_db_session, [dune_id, 9999])
+    assert [result["status"] for result in deleted] == ["deleted", "not_found"]
+    books = await get_books(test_db_session, {})
+    assert [book["title"] for book in books] == ["Cosmos"]
+
+
+@pytest.mark.asyncio
+async def test_batch_update_reports_conflicts_per_item(test_db_session):
+    created = await create_books(test_db_session, [
+        BookCreate(title="Dune", genre="Fiction", published_year=1965, author="Frank Herbert"),
+        BookCreate(title="Dune Messiah", genre="Fiction", published_year=1965, author="Frank Herbert"),
+        BookCreate(title="Cosmos", genre="Science", published_year=1980, author="Carl Sagan"),
+    ])
+    dune_id, messiah_id, cosmos_id = (result["id"] for result in created)
+
+    updated = await update_books(test_db_session, [
+        BookBatchUpdate(id=cosmos_id),
+        BookBatchUpdate(id=messiah_id, title="Dune"),
+        BookBatchUpdate(id=cosmos_id, genre="History"),
+    ])
+    assert [result["status"] for result in updated] == ["error", "conflict", "updated"]
+    assert updated[1]["detail"] == DUPLICATE_BOOK_DETAIL
+    assert updated[2]["book"]["genre"] == "History"
+
+    books = await get_books(test_db_session, {}, sort_by="title")
+    assert [(book["id"], book["title"]) for book in books] == [
+        (cosmos_id, "Cosmos"), (dune_id, "Dune"), (messiah_id, "Dune Messiah")
+    ]
+
+
+@pytest.mark.asyncio
+async def test_search_books_ranks_title_and_author_matches(test_db_session):
+    for title, author in [("The Left Hand of Darkness", "Ursula K. Le Guin"), ("Dune", "Frank Herbert"),
+                          ("Darkness at Noon", "Arthur Koestler"), ("Cosmos", "Carl Sagan")]:
+        await create_book(test_db_session, BookCreate(title=title, genre="Fiction", published_year=1970, author=author))
+
+    titles = [book["title"] for book in await search_books(test_db_session, "darkness")]
+    assert titles[:2] == ["Darkness at Noon", "The Left Hand of Darkness"]
+    assert "Dune" not in titles
+
+    books = await search_books(test_db_session, "herbrt")
+    assert books[0]["title"] == "Dune"
+    assert books[0]["author"]["name"] == "Frank Herbert"
+
+    await update_book(test_db_session, books[0]["id"], BookUpdate(title="Children of Dune"))
+    assert [book["title"] for book in await search_books(test_db_session, "children")] == ["Children of Dune"]
+    assert [book["title"] for book in await search_books(test_db_session, "Co")] == ["Cosmos"]
+
+
+@pytest.mark.asyncio
+async def test_count_books_exact_and_approximate(test_db_session):
+    for year in (1965, 1969, 1980):
+        await create_book(test_db_session, BookCreate(title=f"Book {year}", genre="Fiction", published_year=year,
+                                                      author="Author"))
+
+    counts = await count_books(test_db_session, {"published_year__gte": 1966})
+    assert counts == {"total": 2, "total_is_estimate": False}
+
+    counts = await count_books(test_db_session, {}, approximate=True)
+    assert counts == {"total": 3, "total_is_estimate": True}
+
+
+@pytest.mark.asyncio
+async def test_get_books_reuses_registered_statement(test_db_session):
+    await create_book(test_db_session, BookCreate(title="Dune", genre="Fiction", published_year=1965, author="Author"))
+
+    await get_books(test_db_session, {"genre": "Fiction", "published_year__gte": 1900})
+    hits = queries.stats()["hits"]
+    books = await get_books(test_db_session, {"published_year__gte": 1950, "genre": "Fiction"})
+
+    assert [book["title"] for book in books] == ["Dune"]
+    assert queries.stats()["hits"] == hits + 1
+
+
+@pytest.mark.asyncio
+async def test_denormalized_author_name_follows_renames_and_raw_inserts(test_db_session, monkeypatch):
+    created_book = await create_book(
+        test_db_session, BookCreate(title="Dune", genre="Fiction", published_year=1965, author="Frank Herbert")
+    )
+    await test_db_session.execute(text("UPDATE authors SET name = 'F. Herbert' WHERE id = :id"),
+                                  {"id": created_book["author"]["id"]})
+    await test_db_session.execute(text("""
+        INSERT INTO books (title, genre, published_year, author_id) VALUES ('Dune Messiah', 'Fiction', 1969, :id)
+    """), {"id": created_book["author"]["id"]})
+    await test_db_session.commit()
+
+    denormalized = await get_books(test_db_session, {}, "title", "asc", 1, 10)
+    assert [book["author"]["name"] for book in denormalized] == ["F. Herbert", "F. Herbert"]
+
+    monkeypatch.setattr(settings, "BOOKS_DENORMALIZED_READS", False)
+    assert await get_books(test_db_session, {}, "title", "asc", 1, 10) == denormalized
+
+
+@pytest.mark.asyncio
+async def test_get_authors_pages_with_books_in_two_queries(test_db_session):
+    for title, author in [("Dune", "Herbert"), ("Dune Messiah", "Herbert"), ("Cosmos", "Sagan"),
+                          ("Contact", "Sagan"), ("Emma", "Austen")]:
+        await create_book(test_db_session, BookCreate(title=title, genre="Fiction", published_year=1970, author=author))
+
+    statements = []
+
+    def listener(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(test_db_session.bind.sync_engine, "before_cursor_execute", listener)
+    try:
+        first_page = await get_authors(test_db_session, page_size=2, books_limit=1)
+    finally:
+        event.remove(test_db_session.bind.sync_engine, "before_cursor_execute", listener)
+
+    assert len(statements) == 2
+    assert [author["name"] for author in first_page["items"]] == ["Austen", "Herbert"]
+    assert first_page["items"][1]["book_count"] == 2
+    assert [book["title"] for book in first_page["items"][1]["books"]] == ["Dune"]
+
+    second_page = await get_authors(test_db_session, page_size=2, cursor=first_page["next_cursor"])
+    assert [author["name"] for author in second_page["items"]] == ["Sagan"]
+    assert [book["title"] for book in second_page["items"][0]["books"]] == ["Contact", "Cosmos"]
+    assert second_page["next_cursor"] is None
+
+    author = await get_author_by_id(test_db_session, first_page["items"][0]["id"])
+    assert author["books"][0]["title"] == "Emma"
+
+    counted_only = await get_authors(test_db_session, page_size=2, books_limit=0)
+    assert [(author["book_count"], author["books"]) for author in counted_only["items"]] == [(1, []), (2, [])]
+    author = await get_author_by_id(test_db_session, first_page["items"][1]["id"], books_limit=0)
+    assert (author["book_count"], author["books"]) == (2, [])
@@ -0,0 +1,125 @@
+import logging
+import os
+import subprocess
+import sys
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from app.core import metrics
+from app.core.config import settings
+from app.core.database import (
+    alembic_heads, build_engine, check_schema, created_engines, dispose_engines, get_engine, get_read_session_factory,
+    get_session_factory, instrument_engine, pool_limits, warm_pool
+)
+from app.routes.metrics import read_metrics
+
+
+@pytest.fixture
+async def instrumented_app():
+    engine = instrument_engine(create_async_engine("sqlite+aiosqlite:///:memory:"))
+    app = FastAPI()
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    @app.get("/probe/{name}")
+    async def probe(name: str):
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+            await conn.execute(text("SELECT 2"))
+        return {"name": name}
+
+    yield app
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_middleware_records_sql_per_request(instrumented_app, call_app):
+    status, headers, _ = await call_app("GET", "/probe/first", asgi_app=instrumented_app)
+
+    assert status == 200
+    assert 'desc="2 queries"' in headers["server-timing"]
+
+    rendered = metrics.render()
+    assert 'http_request_duration_seconds_count{method="GET",route="/probe/{name}",status="200"}' in rendered
+    assert 'http_request_db_queries_bucket{route="/probe/{name}",le="2"}' in rendered
+
+
+@pytest.mark.asyncio
+async def test_slow_queries_are_logged(instrumented_app, monkeypatch, caplog, call_app):
+    monkeypatch.setattr(settings, "SLOW_QUERY_MS", 0)
+    with caplog.at_level(logging.WARNING, logger="app.core.database"):
+        await call_app("GET", "/probe/slow", asgi_app=instrumented_app)
+
+    assert any(record.getMessage().endswith("SELECT 1") for record in caplog.records)
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint_includes_cache_stats():
+    response = await read_metrics()
+    body = response.body.decode()
+
+    assert "# TYPE book_cache_hits_total counter" in body
+    assert "password_hasher_workers" in body
+    assert "query_registry_size" in body
+
+
+@pytest.mark.asyncio
+async def test_check_schema_compares_alembic_head():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    with pytest.raises(RuntimeError, match="not managed by Alembic"):
+        await check_schema(engine)
+
+    async with engine.begin() as conn:
+        await conn.execute(text("CREATE TABLE alembic_version (version_num VARCHAR(32) NOT NULL)"))
+        await conn.execute(text("INSERT INTO alembic_version VALUES ('8ea5732f4a98')"))
+    with pytest.raises(RuntimeError, match="alembic upgrade head"):
+        await check_schema(engine)
+
+    head, = alembic_heads()
+    async with engine.begin() as conn:
+        await conn.execute(text("UPDATE alembic_version SET version_num = :head"), {"head": head})
+    assert await check_schema(engine) == head
+    await engine.dispose()
+
+
+def test_pool_limits_split_connection_budget(monkeypatch):
+    monkeypatch.setattr(settings, "DB_POOL_SIZE", 10)
+    monkeypatch.setattr(settings, "DB_MAX_OVERFLOW", 20)
+    monkeypatch.setattr(settings, "WEB_CONCURRENCY", 4)
+    monkeypatch.setattr(settings, "DB_MAX_CONNECTIONS", 90)
+    assert pool_limits() == (10, 12)
+
+    monkeypatch.setattr(settings, "DB_MAX_CONNECTIONS", 20)
+    assert pool_limits() == (5, 0)
+
+    monkeypatch.setattr(settings, "WEB_CONCURRENCY", None)
+    with pytest.raises(ValueError):
+        pool_limits()
+
+    monkeypatch.setattr(settings, "DB_MAX_CONNECTIONS", None)
+    assert pool_limits() == (10, 20)
+
+
+@pytest.mark.asyncio
+async def test_warm_pool_opens_idle_connections(tmp_path):
+    engine = build_engine(f"sqlite+aiosqlite:///{tmp_path / 'warm.db'}")
+    assert await warm_pool(engine) == engine.pool.size()
+    assert engine.pool.checkedin() == engine.pool.size()
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_engines_are_created_on_first_use(tmp_path, monkeypatch):
+    result = subprocess.run([sys.executable, "-c", "import app.main"], env={**os.environ, "DATABASE_URL": ""},
+                            capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+
+    await dispose_engines()
+    monkeypatch.setattr(settings, "DATABASE_URL", f"sqlite+aiosqlite:///{tmp_path / 'lazy.db'}")
+    monkeypatch.setattr(settings, "DATABASE_READ_URL", None)
+    assert created_engines() == {}
+    try:
+        assert get_read_session_factory() is get_session_factory()
+        assert created_engines()["replica"] is get_engine()
+    finally:
+        await dispose_engines()
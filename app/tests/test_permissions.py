@@ -1,3 +1,4 @@
+import inspect
 import pytest
 from fastapi import HTTPException, status
 from app.core.security import create_access_token, hash_password
@@ -43,15 +44,15 @@ def access_token(test_user):
 
 
 @pytest.mark.asyncio
-async def test_get_current_user_with_valid_token(access_token, test_db_session):
-    username = await Permissions.get_current_user(access_token, test_db_session)
+async def test_get_current_user_with_valid_token(access_token):
+    username = await Permissions.get_current_user(access_token)
     assert username == "testuser"
 
 
 @pytest.mark.asyncio
-async def test_get_current_user_with_invalid_token(test_db_session):
+async def test_get_current_user_with_invalid_token():
     with pytest.raises(HTTPException) as exc_info:
-        await Permissions.get_current_user("invalid_token", test_db_session)
+        await Permissions.get_current_user("invalid_token")
 
     assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
     assert exc_info.value.detail == "Invalid or expired token"
@@ -61,3 +62,15 @@ async def test_get_current_user_with_invalid_token(test_db_session):
 async def test_is_authenticated():
     user = await Permissions.is_authenticated(current_user="testuser")
     assert user == "testuser"
+
+
+def test_is_authenticated_awaits_token_check():
+    dependency = inspect.signature(Permissions.is_authenticated).parameters["current_user"].default.dependency
+    assert inspect.iscoroutinefunction(dependency)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("headers", [{}, {"Authorization": "Bearer invalid_token"}])
+async def test_protected_route_rejects_unauthenticated_request(headers, override_get_db, call_app):
+    response_status, _, _ = await call_app("POST", "/books/", headers=headers, json_body={})
+    assert response_status == status.HTTP_401_UNAUTHORIZED
@@ -0,0 +1,495 @@
+import csv
+import io
+import json
+import asyncio
+import os
+import subprocess
+import sys
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from email.utils import format_datetime
+import pytest
+from fastapi import HTTPException, Request, Response, UploadFile
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
+from app.core.cache import BookCache, MemoryCacheBackend, book_cache
+from app.core import database
+from app.core.database import Base, build_engine, get_read_session_factory
+from app.core.jobs import Job, JobRunner, MemoryJobQueue, SharedJobQueue, job_runner
+from app.crud.raw_sql_crud import (
+    compact_book_changes, create_book, delete_book, latest_book_change, stream_book_changes, sync_book_cache,
+    update_book
+)
+from app.main import app
+from app.routes import books as books_routes
+from app.routes.books import add_book, import_books, fetch_book, list_books, export_books, book_changes
+from app.routes.jobs import get_job
+from app.schemas.book import BookCreate, BookResponse, BookUpdate
+from app.schemas.job import JobResponse
+
+
+def read_json(response: Response):
+    return json.loads(response.body)
+
+
+def make_request(headers: dict = None) -> Request:
+    raw_headers = [(key.lower().encode(), value.encode()) for key, value in (headers or {}).items()]
+    return Request({"type": "http", "method": "GET", "headers": raw_headers})
+
+
+@pytest.fixture
+def routed_session(test_db_session, override_get_db):
+    @asynccontextmanager
+    async def session_factory():
+        yield test_db_session
+
+    app.dependency_overrides[get_read_session_factory] = lambda: session_factory
+
+
+@pytest.fixture
+def worker_session(test_db_session, monkeypatch):
+    @asynccontextmanager
+    async def session_factory():
+        yield test_db_session
+
+    monkeypatch.setattr(books_routes, "get_session_factory", lambda: session_factory)
+
+
+@pytest.mark.asyncio
+async def test_import_books_runs_as_background_job(test_db_session, worker_session):
+    books_data = [
+        {"title": "Book 1", "genre": "Fantasy", "published_year": 2020, "author": "Author 1"},
+        {"title": "Book 2", "genre": "Fiction", "published_year": 2021, "author": "Author 2"}
+    ]
+    upload = UploadFile(file=io.BytesIO(json.dumps(books_data).encode()), filename="books.json")
+
+    response = Response()
+    queued = await import_books(response, file=upload, mode="insert", current_user="testuser")
+    assert queued["status"] == "queued"
+    assert response.headers["location"] == f"/jobs/{queued['id']}"
+    assert not upload.file.closed
+
+    job = await job_runner.get(queued["id"])
+    await job.wait()
+    status = await get_job(queued["id"], current_user="testuser")
+
+    assert status["status"] == "succeeded"
+    assert status["result"]["imported"] == 2
+    assert status["progress"] == {
+        "processed": 2, "imported": 2, "inserted": 2, "updated": 0, "unchanged": 0, "failed": 0
+    }
+    assert status["rows_per_second"] > 0
+    assert not os.path.exists(job.payload["path"])
+    result = await test_db_session.execute(text("SELECT COUNT(*) FROM books"))
+    assert result.scalar() == 2
+
+    with pytest.raises(HTTPException) as exc_info:
+        await get_job(queued["id"], current_user="someone-else")
+    assert exc_info.value.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_import_job_reports_invalid_encoding(worker_session):
+    upload = UploadFile(file=io.BytesIO(b"title,genre\n\xff\xfe,Fiction\n"), filename="books.csv")
+
+    queued = await import_books(Response(), file=upload, mode="insert", current_user="testuser")
+    job = await job_runner.get(queued["id"])
+    await job.wait()
+
+    assert job.status == "failed"
+    assert job.error == "File must be UTF-8 encoded"
+
+
+@pytest.mark.asyncio
+async def test_job_state_is_shared_between_workers(tmp_path):
+    accepting, other = (SharedJobQueue(10, 1, str(tmp_path / "jobs")) for _ in range(2))
+    job = Job("import_books", {}, owner="testuser")
+    await accepting.enqueue(job)
+    job.mark_running()
+    job.progress = {"processed": 3}
+    await accepting.save(job)
+
+    stored = await other.get(job.id)
+    assert stored.owner == "testuser"
+    assert JobResponse.model_validate(stored.to_dict()).progress == {"processed": 3}
+    assert await other.get("../" + job.id) is None
+
+    job.mark_finished(result={})
+    await accepting.save(job)
+    await accepting.enqueue(Job("import_books", {}))
+    assert await other.get(job.id) is None
+
+
+@pytest.mark.asyncio
+async def test_job_state_dir_must_be_private(tmp_path):
+    shared_dir = tmp_path / "shared"
+    shared_dir.mkdir()
+    shared_dir.chmod(0o777)
+    with pytest.raises(RuntimeError):
+        await SharedJobQueue(10, 10, str(shared_dir)).save(Job("import_books", {}, owner="testuser"))
+
+    queue = SharedJobQueue(10, 10, str(tmp_path / "jobs"))
+    planted = tmp_path / "planted.json"
+    planted.write_text(json.dumps({"owner": "testuser", "id": "0" * 32}))
+    await queue.save(Job("import_books", {}))
+    (tmp_path / "jobs" / f"{'0' * 32}.json").symlink_to(planted)
+    assert await queue.get("0" * 32) is None
+
+
+@pytest.mark.asyncio
+async def test_job_runner_drains_running_jobs_on_stop():
+    runner = JobRunner(MemoryJobQueue(10, 10), workers=1)
+    release = asyncio.Event()
+
+    async def handler(job: Job):
+        if job.payload["wait"]:
+            await release.wait()
+        return {}
+
+    runner.register("test", handler)
+    running = await runner.submit("test", {"wait": True})
+    queued = await runner.submit("test", {"wait": False})
+    await asyncio.sleep(0)
+    assert running.status == "running"
+
+    stopping = asyncio.create_task(runner.stop(timeout=5))
+    await asyncio.sleep(0)
+    with pytest.raises(HTTPException) as exc_info:
+        await runner.submit("test", {"wait": False})
+    assert exc_info.value.status_code == 503
+    assert queued.status == "failed"
+
+    release.set()
+    await stopping
+    assert running.status == "succeeded"
+
+    release.clear()
+    stuck = await runner.submit("test", {"wait": True})
+    await asyncio.sleep(0)
+    await runner.stop(timeout=0.01)
+    assert stuck.error == "Job was cancelled because the server shut down"
+
+
+def test_several_workers_keep_caches_and_share_job_state():
+    script = ("from app.core.cache import author_cache, book_cache, count_cache; from app.core.jobs import job_runner; "
+              "print(book_cache.enabled, author_cache.maxsize > 0, count_cache.maxsize > 0, "
+              "type(job_runner.queue).__name__)")
+    result = subprocess.run([sys.executable, "-c", script], env={**os.environ, "WEB_CONCURRENCY": "2"},
+                            capture_output=True, text=True)
+    assert result.stdout.split() == ["True", "True", "True", "SharedJobQueue"], result.stderr
+
+
+@pytest.mark.asyncio
+async def test_book_cache_follows_writes_from_other_workers(test_db_session):
+    created_book = await create_book(
+        test_db_session, BookCreate(title="Dune", genre="Fiction", published_year=1965, author="Frank Herbert")
+    )
+    since = await latest_book_change(test_db_session)
+    await fetch_book(created_book["id"], make_request(), Response(), db=test_db_session)
+
+    # Another worker's write reaches the database but not this worker's cache
+    await test_db_session.execute(text("UPDATE books SET genre = 'History' WHERE id = :id"), {"id": created_book["id"]})
+    await test_db_session.commit()
+    book = read_json(await fetch_book(created_book["id"], make_request(), Response(), db=test_db_session))
+    assert book["genre"] == "Fiction"
+
+    assert await sync_book_cache(test_db_session, since, batch_size=1) > since
+    book = read_json(await fetch_book(created_book["id"], make_request(), Response(), db=test_db_session))
+    assert book["genre"] == "History"
+
+
+@pytest.mark.asyncio
+async def test_fetch_book_is_cached_until_update(test_db_session):
+    created_book = await create_book(
+        test_db_session, BookCreate(title="Dune", genre="Fiction", published_year=1965, author="Frank Herbert")
+    )
+
+    await fetch_book(created_book["id"], make_request(), Response(), db=test_db_session)
+    hits = book_cache.hits
+    book = read_json(await fetch_book(created_book["id"], make_request(), Response(), db=test_db_session))
+    assert book_cache.hits == hits + 1
+    assert book["title"] == "Dune"
+
+    await update_book(test_db_session, created_book["id"], BookUpdate(title="Dune Messiah"))
+    book = read_json(await fetch_book(created_book["id"], make_request(), Response(), db=test_db_session))
+    assert book["title"] == "Dune Messiah"
+
+
+@pytest.mark.asyncio
+async def test_book_cache_does_not_refill_from_lagging_replica():
+    cache = BookCache(MemoryCacheBackend(100, 60), replica_lag=60)
+    replica = {"title": "Dune"}
+    loads = []
+
+    async def load():
+        loads.append(dict(replica))
+        return dict(replica)
+
+    await cache.get_book(1, load)
+    await cache.get_book(1, load)
+    assert len(loads) == 1
+
+    await cache.invalidate_books(1)
+    await cache.get_book(1, load)
+    replica["title"] = "Dune Messiah"
+    assert (await cache.get_book(1, load))["title"] == "Dune Messiah"
+    assert len(loads) == 3
+
+    await cache.get_books({"page": 1}, load)
+    await cache.get_books({"page": 1}, load)
+    assert len(loads) == 5
+
+
+@pytest.mark.asyncio
+async def test_list_books_cache_invalidated_by_create(test_db_session):
+    async def list_titles():
+        books = await list_books(make_request(), Response(), db=test_db_session, filters={}, sort_by="title",
+                                 sort_order="asc", page=1, page_size=10, pagination="offset", cursor=None,
+                                 include_total=False, facets=False, count="exact")
+        return [book["title"] for book in read_json(books)]
+
+    assert await list_titles() == []
+    await create_book(test_db_session, BookCreate(title="Dune", genre="Fiction", published_year=1965, author="Author"))
+    assert await list_titles() == ["Dune"]
+
+
+@pytest.mark.asyncio
+async def test_fetch_book_conditional_get(test_db_session):
+    created_book = await create_book(
+        test_db_session, BookCreate(title="Dune", genre="Fiction", published_year=1965, author="Frank Herbert")
+    )
+
+    response = Response()
+    await fetch_book(created_book["id"], make_request(), response, db=test_db_session)
+    etag = response.headers["etag"]
+    assert response.headers["last-modified"]
+
+    not_modified = await fetch_book(created_book["id"], make_request({"If-None-Match": etag}), Response(),
+                                    db=test_db_session)
+    assert not_modified.status_code == 304
+
+    await update_book(test_db_session, created_book["id"], BookUpdate(genre="History"))
+    response = Response()
+    book = await fetch_book(created_book["id"], make_request({"If-None-Match": etag}), response, db=test_db_session)
+    assert book.status_code == 200
+    assert book.headers["etag"] == response.headers["etag"] != etag
+    assert read_json(book)["genre"] == "History"
+
+
+@pytest.mark.asyncio
+async def test_list_books_validates_by_etag_only(test_db_session):
+    async def list_page(headers: dict = None):
+        response = Response()
+        books = await list_books(make_request(headers), response, db=test_db_session, filters={}, sort_by="title",
+                                 sort_order="asc", page=1, page_size=10, pagination="offset", cursor=None,
+                                 include_total=False, facets=False, count="exact")
+        return books, response
+
+    for title in ["Dune", "Emma"]:
+        await create_book(test_db_session, BookCreate(title=title, genre="Fiction", published_year=1965,
+                                                      author="Author"))
+    books, response = await list_page()
+    etag = response.headers["etag"]
+    assert "last-modified" not in response.headers
+
+    emma = read_json(books)[1]
+    await delete_book(test_db_session, emma["id"])
+    since = format_datetime(datetime.now(timezone.utc), usegmt=True)
+    books, response = await list_page({"If-Modified-Since": since})
+    assert books.status_code == 200
+    assert [book["title"] for book in read_json(books)] == ["Dune"]
+
+    not_modified, _ = await list_page({"If-None-Match": response.headers["etag"]})
+    assert not_modified.status_code == 304
+    assert response.headers["etag"] != etag
+
+
+@pytest.mark.asyncio
+async def test_export_route_is_not_shadowed_by_book_id(test_db_session, routed_session, call_app):
+    await create_book(test_db_session, BookCreate(title="Dune", genre="Fiction", published_year=1965, author="Author"))
+
+    status, _, body = await call_app("GET", "/books/export", {"format": "ndjson"})
+
+    assert status == 200
+    assert [json.loads(line)["title"] for line in body.decode().splitlines()] == ["Dune"]
+
+
+@pytest.mark.asyncio
+async def test_search_route_is_not_shadowed_by_book_id(test_db_session, routed_session, call_app):
+    await create_book(test_db_session, BookCreate(title="Dune", genre="Fiction", published_year=1965, author="Author"))
+
+    status, _, body = await call_app("GET", "/books/search", {"q": "Dune"})
+
+    assert status == 200
+    assert [book["title"] for book in json.loads(body)] == ["Dune"]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("export_format", ["ndjson", "csv"])
+async def test_export_books_streams_filtered_rows(test_db_session, export_format):
+    for title, genre in [("Dune", "Fiction"), ("Cosmos", "Science"), ("Contact", "Fiction")]:
+        await create_book(test_db_session, BookCreate(title=title, genre=genre, published_year=1980, author="Author"))
+
+    @asynccontextmanager
+    async def session_factory():
+        yield test_db_session
+
+    response = await export_books(format=export_format, filters={"genre__in": ["Fiction"]},
+                                  session_factory=session_factory)
+    body = "".join([chunk async for chunk in response.body_iterator])
+
+    if export_format == "ndjson":
+        titles = [json.loads(line)["title"] for line in body.splitlines()]
+    else:
+        titles = [row["title"] for row in csv.DictReader(io.StringIO(body))]
+    assert titles == ["Dune", "Contact"]
+
+
+@pytest.mark.asyncio
+async def test_book_changes_streams_latest_state_and_tombstones(test_db_session):
+    books = [
+        await create_book(test_db_session, BookCreate(title=title, genre="Fiction", published_year=1980, author="A"))
+        for title in ["Dune", "Cosmos", "Contact"]
+    ]
+
+    @asynccontextmanager
+    async def session_factory():
+        yield test_db_session
+
+    async def read_changes(since, limit=None):
+        response = await book_changes(since=since, limit=limit, session_factory=session_factory)
+        return [json.loads(line) for line in "".join([chunk async for chunk in response.body_iterator]).splitlines()]
+
+    since = (await read_changes(0))[-1]["seq"]
+    await update_book(test_db_session, books[0]["id"], BookUpdate(genre="Science"))
+    await update_book(test_db_session, books[0]["id"], BookUpdate(genre="History"))
+    await delete_book(test_db_session, books[1]["id"])
+
+    changes = await read_changes(since)
+    assert [(change["op"], change["id"]) for change in changes] == [
+        ("upsert", books[0]["id"]), ("delete", books[1]["id"])
+    ]
+    assert changes[0]["book"]["genre"] == "History"
+    assert changes[0]["book"]["version"] == 3
+    assert await read_changes(changes[-1]["seq"]) == []
+    assert len(await read_changes(0, limit=2)) == 2
+
+
+@pytest.mark.asyncio
+async def test_book_changes_follow_commit_order(tmp_path):
+    engine = build_engine(f"sqlite+aiosqlite:///{tmp_path / 'changes.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.execute(text("INSERT INTO authors (name) VALUES ('Author')"))
+    sessions = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    insert = text("INSERT INTO books (title, genre, published_year, author_id, author_name) "
+                  "VALUES (:title, 'Fiction', 1965, 1, 'Author')")
+
+    async def read_changes(since):
+        async with sessions() as db:
+            return [(row["seq"], row["title"]) async for row in stream_book_changes(db, since)]
+
+    try:
+        async with sessions() as first, sessions() as second:
+            await first.execute(insert, {"title": "Dune"})
+            second_write = asyncio.create_task(second.execute(insert, {"title": "Emma"}))
+            await asyncio.sleep(0.2)
+            assert not second_write.done()
+            assert await read_changes(0) == []
+
+            await first.commit()
+            await second_write
+            mirrored = await read_changes(0)
+            assert [title for _, title in mirrored] == ["Dune"]
+
+            await second.commit()
+            assert [title for _, title in await read_changes(mirrored[-1][0])] == ["Emma"]
+    finally:
+        await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_compact_book_changes_keeps_feed_results(test_db_session):
+    dune = await create_book(test_db_session, BookCreate(title="Dune", genre="Fiction", published_year=1965,
+                                                         author="Author"))
+    emma = await create_book(test_db_session, BookCreate(title="Emma", genre="Fiction", published_year=1815,
+                                                         author="Author"))
+    for genre in ["Science", "History"]:
+        await update_book(test_db_session, dune["id"], BookUpdate(genre=genre))
+    await delete_book(test_db_session, emma["id"])
+
+    async def feed(since):
+        return [(row["book_id"], row["id"]) async for row in stream_book_changes(test_db_session, since)]
+
+    before = {since: await feed(since) for since in range(6)}
+    assert await compact_book_changes(test_db_session) == 3
+    assert {since: await feed(since) for since in range(6)} == before
+    assert (await test_db_session.execute(text("SELECT COUNT(*) FROM book_changes"))).scalar() == 2
+
+
+@pytest.mark.asyncio
+async def test_list_books_envelope_with_total_and_facets(test_db_session):
+    for title, genre, year in [("Dune", "Fiction", 1965), ("Dune Messiah", "Fiction", 1969),
+                               ("Cosmos", "Science", 1980)]:
+        await create_book(test_db_session, BookCreate(title=title, genre=genre, published_year=year, author="Author"))
+
+    books_page = read_json(await list_books(make_request(), Response(), db=test_db_session, filters={},
+                                            sort_by="title", sort_order="asc", page=1, page_size=2,
+                                            pagination="offset", cursor=None, include_total=True, facets=True,
+                                            count="exact"))
+
+    assert len(books_page["items"]) == 2
+    assert books_page["total"] == 3
+    assert books_page["facets"]["genre"] == [{"value": "Fiction", "count": 2}, {"value": "Science", "count": 1}]
+    assert books_page["facets"]["published_decade"] == [{"value": 1960, "count": 2}, {"value": 1980, "count": 1}]
+
+    with pytest.raises(HTTPException) as exc_info:
+        await list_books(make_request(), Response(), db=test_db_session, filters={}, sort_by="title",
+                         sort_order="asc", page=1, page_size=2, pagination="offset", cursor=None, include_total=True,
+                         facets=True, count="approximate")
+    assert exc_info.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_reads_are_routed_to_replica(tmp_path, monkeypatch, call_app):
+    engines = {name: build_engine(f"sqlite+aiosqlite:///{tmp_path / name}.db") for name in ("primary", "replica")}
+    for engine in engines.values():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+    monkeypatch.setattr(database, "_engines", dict(engines))
+    primary, replica = (sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+                        for engine in engines.values())
+
+    try:
+        async with primary() as db:
+            created_book = await add_book(BookCreate(title="Dune", genre="Fiction", published_year=1965,
+                                                     author="Frank Herbert"), db=db, current_user="testuser")
+        status, _, _ = await call_app("GET", f"/books/{created_book['id']}")
+        assert status == 404
+
+        async with replica() as db:
+            await create_book(db, BookCreate(title="Dune", genre="Fiction", published_year=1965, author="F. Herbert"))
+        status, _, body = await call_app("GET", f"/books/{created_book['id']}")
+        assert status == 200
+        assert json.loads(body)["author"]["name"] == "F. Herbert"
+
+        status, _, body = await call_app("GET", "/books/export", {"format": "ndjson"})
+        assert [json.loads(line)["author"]["name"] for line in body.decode().splitlines()] == ["F. Herbert"]
+    finally:
+        for engine in engines.values():
+            await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_list_books_serializes_rows_like_response_model(test_db_session):
+    await create_book(test_db_session, BookCreate(title="Dune", genre="Fiction", published_year=1965, author="Author"))
+
+    response = await list_books(make_request(), Response(), db=test_db_session, filters={}, sort_by="title",
+                                sort_order="asc", page=1, page_size=10, pagination="offset", cursor=None,
+                                include_total=False, facets=False, count="exact")
+
+    books = read_json(response)
+    assert response.media_type == "application/json"
+    assert books == [BookResponse.model_validate(book).model_dump() for book in books]
+    assert set(books[0]) == {"id", "title", "genre", "published_year", "author"}
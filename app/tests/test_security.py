@@ -1,6 +1,11 @@
 import pytest
+import time
 from datetime import timedelta
-from app.core.security import hash_password, verify_password, create_access_token, decode_access_token
+from app.core.cache import LRUCache
+from app.core.security import (
+    hash_password, verify_password, create_access_token, decode_access_token,
+    hash_password_async, verify_password_async, password_hasher, PasswordHasher, token_cache
+)
 from app.core.config import settings
 from jose import jwt
 from fastapi import HTTPException, status
@@ -38,3 +43,55 @@ def test_decode_access_token():
     assert exc_info.value.status_code == status.HTTP_401_UNAUTHORIZED
     assert exc_info.value.detail == "Invalid or expired token"
 
+
+@pytest.mark.asyncio
+async def test_hash_and_verify_password_async():
+    hashed = await hash_password_async("password123")
+
+    assert await verify_password_async("password123", hashed)
+    assert not await verify_password_async("wrongpassword", hashed)
+    assert password_hasher.stats()["queued"] == 0
+
+
+@pytest.mark.asyncio
+async def test_password_hasher_rejects_when_queue_full():
+    hasher = PasswordHasher(max_workers=1, max_queue=0)
+
+    with pytest.raises(HTTPException) as exc_info:
+        await hasher.run(hash_password, "password123")
+
+    assert exc_info.value.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+    assert hasher.stats()["rejected"] == 1
+
+
+def test_decode_access_token_uses_cache():
+    token = create_access_token({"sub": "testuser"}, timedelta(minutes=5))
+
+    decode_access_token(token)
+    hits = token_cache.hits
+    decoded = decode_access_token(token)
+
+    assert decoded["sub"] == "testuser"
+    assert token_cache.hits == hits + 1
+
+
+def test_decode_access_token_does_not_cache_expired_token():
+    token = create_access_token({"sub": "testuser"}, timedelta(minutes=-5))
+
+    with pytest.raises(HTTPException):
+        decode_access_token(token)
+    with pytest.raises(HTTPException):
+        decode_access_token(token)
+
+
+def test_lru_cache_honors_expiry_and_size():
+    cache = LRUCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2, expires_at=time.time() - 1)
+    assert cache.get("b") is None
+
+    cache.set("c", 3)
+    assert cache.get("a") == 1
+    cache.set("d", 4)
+    assert cache.get("c") is None
+    assert cache.get("a") == 1
@@ -0,0 +1,100 @@
+"""Drive the FastAPI app in-process with concurrent clients and report latency per endpoint.
+
+Usage: DATABASE_URL=sqlite+aiosqlite:///./bench.db python -m benchmarks.bench_api --seed 10000 --concurrency 16
+"""
+import argparse
+import asyncio
+import random
+import time
+import uuid
+from sqlalchemy import text
+from app.core.database import get_session_factory, init_db
+from app.core.security import create_access_token
+from app.main import app
+from benchmarks.common import ASGIClient, print_results, summarize, write_results
+from benchmarks.seed import seed
+
+SEARCH_TERMS = ["Mockingbird", "Orwell", "Pride", "Gatsby", "Tolkien"]
+
+
+def build_endpoints(book_ids: list, run_id: str, rng: random.Random) -> dict:
+    return {
+        "GET /books/{id}": lambda i: ("GET", f"/books/{rng.choice(book_ids)}", None, None),
+        "GET /books/": lambda i: ("GET", "/books/", {"page": 1 + i % 20, "page_size": 50}, None),
+        "GET /books/?genre": lambda i: (
+            "GET", "/books/", {"genre": ["Fiction", "History"], "min_year": 1900 + i % 100, "page_size": 50}, None
+        ),
+        "GET /books/?cursor": lambda i: ("GET", "/books/", {"pagination": "cursor", "page_size": 50}, None),
+        "GET /books/?facets": lambda i: (
+            "GET", "/books/", {"include_total": "true", "facets": "true", "min_year": 1800 + i % 200}, None
+        ),
+        "GET /books/search": lambda i: ("GET", "/books/search", {"q": SEARCH_TERMS[i % len(SEARCH_TERMS)]}, None),
+        "GET /authors/": lambda i: ("GET", "/authors/", {"page_size": 20, "books_limit": 10}, None),
+        "GET /books/export": lambda i: ("GET", "/books/export", {"genre": "Mystery", "min_year": 2000}, None),
+        "POST /books/": lambda i: ("POST", "/books/", None, {
+            "title": f"bench {run_id} {i}", "genre": "Fiction", "published_year": 2000,
+            "author": f"bench author {i % 10}"
+        }),
+        "PUT /books/{id}": lambda i: (
+            "PUT", f"/books/{rng.choice(book_ids)}", None, {"genre": rng.choice(["Fiction", "History", "Science"])}
+        ),
+    }
+
+
+async def run_endpoint(client: ASGIClient, make_request, requests: int, concurrency: int) -> dict:
+    samples, errors, counter = [], 0, iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for index in counter:
+            method, path, params, body = make_request(index)
+            started = time.perf_counter()
+            status, _ = await client.request(method, path, params, body)
+            samples.append(time.perf_counter() - started)
+            errors += status >= 400
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(samples, time.perf_counter() - started, errors)
+
+
+async def main(args) -> dict:
+    if args.seed:
+        await seed(args.seed, max(1, args.seed // 10), reset=True)
+    await init_db()
+
+    async with get_session_factory()() as db:
+        book_ids = list((await db.execute(text("SELECT id FROM books"))).scalars())
+    if not book_ids:
+        raise SystemExit("The database is empty; run benchmarks.seed first or pass --seed")
+
+    run_id = uuid.uuid4().hex[:8]
+    client = ASGIClient(app, {"Authorization": f"Bearer {create_access_token({'sub': 'benchmark'})}"})
+    endpoints = build_endpoints(book_ids, run_id, random.Random(42))
+    results = {}
+    try:
+        for name, make_request in endpoints.items():
+            if args.only and not any(pattern in name for pattern in args.only):
+                continue
+            await run_endpoint(client, make_request, args.warmup, args.concurrency)
+            results[name] = await run_endpoint(client, make_request, args.requests, args.concurrency)
+    finally:
+        async with get_session_factory()() as db:
+            await db.execute(text("DELETE FROM books WHERE title LIKE :pattern"), {"pattern": f"%{run_id}%"})
+            await db.commit()
+
+    print_results(results)
+    parameters = {"books": len(book_ids), "requests": args.requests, "concurrency": args.concurrency}
+    write_results("api", results, parameters, args.output)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seed", type=int, default=0, help="Reset and seed this many books first")
+    parser.add_argument("--requests", type=int, default=1000, help="Requests per endpoint")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--only", nargs="*", help="Only run endpoints whose name contains one of these")
+    parser.add_argument("--output", help="Results file (defaults to benchmarks/results/api-<commit>.json)")
+    asyncio.run(main(parser.parse_args()))
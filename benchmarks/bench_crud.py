@@ -0,0 +1,130 @@
+"""Micro-benchmark every raw_sql_crud function against the database from DATABASE_URL.
+
+Usage: DATABASE_URL=sqlite+aiosqlite:///./bench.db python -m benchmarks.bench_crud --seed 10000 --iterations 200
+"""
+import argparse
+import asyncio
+import io
+import json
+import random
+import time
+import uuid
+from fastapi import HTTPException
+from sqlalchemy import text
+from app.core.database import get_session_factory
+from app.crud.raw_sql_crud import (
+    create_book, get_book_by_id, update_book, delete_book, create_books, update_books, delete_books, get_books,
+    get_books_by_cursor, count_books, search_books, stream_books, bulk_import_books
+)
+from app.schemas.book import BookCreate, BookUpdate, BookBatchUpdate
+from benchmarks.common import print_results, summarize, write_results
+from benchmarks.seed import seed
+
+BATCH_SIZE = 100
+IMPORT_ROWS = 1000
+SEARCH_TERMS = ["Mockingbird", "Orwell", "Pride", "Gatsby", "Tolkien"]
+
+
+async def run_case(operation, iterations: int, warmup: int) -> dict:
+    samples, errors = [], 0
+    for iteration in range(warmup + iterations):
+        async with get_session_factory()() as db:
+            started = time.perf_counter()
+            try:
+                await operation(db, iteration)
+            except HTTPException:
+                errors += iteration >= warmup
+            elapsed = time.perf_counter() - started
+        if iteration >= warmup:
+            samples.append(elapsed)
+    return summarize(samples, sum(samples), errors)
+
+
+def build_cases(book_ids: list, run_id: str, rng: random.Random) -> dict:
+    created, created_batches, cursor = [], [], {"value": None}
+
+    async def walk_cursor(db, iteration):
+        page = await get_books_by_cursor(db, {}, "title", "asc", 100, cursor["value"])
+        cursor["value"] = page["next_cursor"]
+
+    async def consume_stream(db, iteration):
+        async for _ in stream_books(db, {"genre__in": ["History"], "published_year__gte": 2000}):
+            pass
+
+    async def add_book(db, iteration):
+        book = BookCreate(title=f"bench {run_id} {iteration}", genre="Fiction", published_year=2000,
+                          author=f"bench author {iteration % 10}")
+        created.append((await create_book(db, book))["id"])
+
+    async def add_books(db, iteration):
+        books = [BookCreate(title=f"bench {run_id} {iteration}-{index}", genre="Science", published_year=2001,
+                            author=f"bench author {index % 10}") for index in range(BATCH_SIZE)]
+        created_batches.append([result["id"] for result in await create_books(db, books)])
+
+    async def import_books(db, iteration):
+        rows = [{"title": f"bench-import {run_id} {iteration}-{index}", "genre": "History", "published_year": 1999,
+                 "author": f"bench author {index % 10}"} for index in range(IMPORT_ROWS)]
+        await bulk_import_books(db, io.StringIO("\n".join(map(json.dumps, rows))), "ndjson")
+
+    return {
+        "get_book_by_id": lambda db, i: get_book_by_id(db, rng.choice(book_ids)),
+        "get_books": lambda db, i: get_books(db, {}, "title", "asc", 1, 100),
+        "get_books_deep_page": lambda db, i: get_books(db, {}, "title", "asc", 50, 100),
+        "get_books_filtered": lambda db, i: get_books(
+            db, {"genre__in": ["Fiction"], "published_year__gte": 1950}, "published_year", "desc", 1, 100
+        ),
+        "get_books_by_cursor": walk_cursor,
+        "count_books": lambda db, i: count_books(db, {"genre__in": ["Fiction"]}),
+        "count_books_facets": lambda db, i: count_books(db, {}, with_facets=True),
+        "search_books": lambda db, i: search_books(db, SEARCH_TERMS[i % len(SEARCH_TERMS)], 20),
+        "stream_books": consume_stream,
+        "create_book": add_book,
+        "update_book": lambda db, i: update_book(db, created[i], BookUpdate(title=f"bench {run_id} {i} v2")),
+        "delete_book": lambda db, i: delete_book(db, created[i]),
+        "create_books": add_books,
+        "update_books": lambda db, i: update_books(
+            db, [BookBatchUpdate(id=book_id, genre="History") for book_id in created_batches[i]]
+        ),
+        "delete_books": lambda db, i: delete_books(db, created_batches[i]),
+        "bulk_import_books": import_books,
+    }
+
+
+async def main(args) -> dict:
+    if args.seed:
+        await seed(args.seed, max(1, args.seed // 10), reset=True)
+
+    async with get_session_factory()() as db:
+        book_ids = list((await db.execute(text("SELECT id FROM books"))).scalars())
+    if not book_ids:
+        raise SystemExit("The database is empty; run benchmarks.seed first or pass --seed")
+
+    run_id = uuid.uuid4().hex[:8]
+    cases = build_cases(book_ids, run_id, random.Random(42))
+    results = {}
+    try:
+        for name, operation in cases.items():
+            if args.only and not any(pattern in name for pattern in args.only):
+                continue
+            iterations = args.import_iterations if name == "bulk_import_books" else args.iterations
+            results[name] = await run_case(operation, iterations, args.warmup)
+    finally:
+        async with get_session_factory()() as db:
+            await db.execute(text("DELETE FROM books WHERE title LIKE :pattern"), {"pattern": f"%{run_id}%"})
+            await db.commit()
+
+    print_results(results)
+    write_results("crud", results, {"books": len(book_ids), "iterations": args.iterations, "warmup": args.warmup},
+                  args.output)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seed", type=int, default=0, help="Reset and seed this many books first")
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--import-iterations", type=int, default=5)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--only", nargs="*", help="Only run cases whose name contains one of these")
+    parser.add_argument("--output", help="Results file (defaults to benchmarks/results/crud-<commit>.json)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,70 @@
+"""Compare per-page CPU cost of FastAPI's response_model path with the direct TypeAdapter path.
+
+Usage: DATABASE_URL=sqlite+aiosqlite:///./bench.db python -m benchmarks.bench_serialization [--rows 100]
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+from typing import List
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+from app.routes.books import BOOK_LIST_ADAPTER
+from app.schemas.book import BookResponse
+
+GENRES = ["Fiction", "Non-Fiction", "Science", "History", "Mystery", "Fantasy"]
+
+
+def make_rows(count: int) -> List[dict]:
+    return [{
+        "id": index,
+        "title": f"Book {index}",
+        "genre": GENRES[index % len(GENRES)],
+        "published_year": 1900 + index % 125,
+        "author_id": index % 50,
+        "version": 1,
+        "updated_at": datetime(2025, 1, 1),
+        "author": {"id": index % 50, "name": f"Author {index % 50}"}
+    } for index in range(1, count + 1)]
+
+
+async def response_model_page(field, rows: List[dict]) -> bytes:
+    content = await serialize_response(field=field, response_content=rows, is_coroutine=True)
+    return JSONResponse(content).body
+
+
+def type_adapter_page(rows: List[dict]) -> bytes:
+    return BOOK_LIST_ADAPTER.dump_json(rows)
+
+
+async def measure(label: str, render, iterations: int) -> float:
+    for _ in range(min(iterations, 50)):
+        await render()
+    started = time.process_time()
+    for _ in range(iterations):
+        await render()
+    per_page = (time.process_time() - started) / iterations * 1_000_000
+    print(f"{label:<16} {per_page:10.1f} us/page")
+    return per_page
+
+
+async def main(rows_per_page: int, iterations: int):
+    rows = make_rows(rows_per_page)
+    field = create_model_field("Response_list_books", List[BookResponse], mode="serialization")
+
+    async def fast_path():
+        return type_adapter_page(rows)
+
+    print(f"{rows_per_page} rows per page, {iterations} pages")
+    baseline = await measure("response_model", lambda: response_model_page(field, rows), iterations)
+    fast = await measure("type_adapter", fast_path, iterations)
+    print(f"speedup          {baseline / fast:10.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+    asyncio.run(main(args.rows, args.iterations))
@@ -0,0 +1,121 @@
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+RESULTS_DIR = Path(__file__).parent / "results"
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples: List[float], elapsed: float, errors: int = 0) -> dict:
+    return {
+        "count": len(samples),
+        "errors": errors,
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "p50_ms": round(percentile(samples, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 0.99) * 1000, 3),
+        "max_ms": round(max(samples) * 1000, 3),
+        "throughput_rps": round(len(samples) / elapsed, 1) if elapsed else None,
+    }
+
+
+def print_results(results: Dict[str, dict]):
+    print(f"{'name':<28}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}{'errors':>8}")
+    for name, result in results.items():
+        print(f"{name:<28}{result['count']:>8}{result['p50_ms']:>10.2f}{result['p95_ms']:>10.2f}"
+              f"{result['p99_ms']:>10.2f}{result['throughput_rps'] or 0:>10.1f}{result['errors']:>8}")
+
+
+def write_results(suite: str, results: Dict[str, dict], parameters: dict, output: Optional[str] = None) -> Path:
+    commit = git_commit()
+    path = Path(output) if output else RESULTS_DIR / f"{suite}-{commit}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    database_url = os.getenv("DATABASE_URL", "")
+    document = {
+        "suite": suite,
+        "commit": commit,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "database": database_url.split(":", 1)[0],
+        "parameters": parameters,
+        "results": results,
+    }
+    path.write_text(json.dumps(document, indent=2, sort_keys=True))
+    print(f"Results written to {path}")
+    return path
+
+
+class ASGIClient:
+    def __init__(self, app, headers: Optional[Dict[str, str]] = None):
+        self.app = app
+        self.headers = [(key.lower().encode(), value.encode()) for key, value in (headers or {}).items()]
+
+    async def request(self, method: str, path: str, params: Optional[dict] = None,
+                      json_body=None) -> Tuple[int, bytes]:
+        status, _, body = await self.exchange(method, path, params, json_body)
+        return status, body
+
+    async def exchange(self, method: str, path: str, params: Optional[dict] = None,
+                       json_body=None) -> Tuple[int, Dict[str, str], bytes]:
+        body = json.dumps(json_body).encode() if json_body is not None else b""
+        headers = list(self.headers)
+        if json_body is not None:
+            headers += [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": urlencode(params or {}, doseq=True).encode(),
+            "headers": headers,
+            "client": ("127.0.0.1", 0),
+            "server": ("testserver", 80),
+            "root_path": "",
+        }
+        request_sent, response_complete = False, asyncio.Event()
+        status, response_headers, chunks = 500, {}, []
+
+        async def receive():
+            nonlocal request_sent
+            if request_sent:
+                # Streaming responses watch for a disconnect, so only report one once the body is complete
+                await response_complete.wait()
+                return {"type": "http.disconnect"}
+            request_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                response_headers.update((key.decode(), value.decode()) for key, value in message["headers"])
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+                if not message.get("more_body", False):
+                    response_complete.set()
+
+        await self.app(scope, receive, send)
+        return status, response_headers, b"".join(chunks)
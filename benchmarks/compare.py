@@ -0,0 +1,51 @@
+"""Diff two benchmark result files and flag regressions.
+
+Usage: python -m benchmarks.compare benchmarks/results/api-abc1234.json benchmarks/results/api-def5678.json
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+METRICS = ["p50_ms", "p95_ms", "p99_ms", "throughput_rps"]
+
+
+def change(before: float, after: float) -> float:
+    return (after - before) / before * 100 if before else 0.0
+
+
+def compare(baseline: dict, candidate: dict, metric: str, threshold: float) -> list:
+    regressions = []
+    print(f"{baseline['commit']} -> {candidate['commit']} ({candidate['suite']}, regression threshold "
+          f"{threshold:.0f}% on {metric})")
+    print(f"{'name':<28}" + "".join(f"{name:>29}" for name in METRICS))
+    for name, after in candidate["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            print(f"{name:<28}{'(new)':>29}")
+            continue
+        cells = "".join(
+            f"{before[key] or 0:>9.2f} -> {after[key] or 0:>9.2f} {change(before[key] or 0, after[key] or 0):+5.0f}%"
+            for key in METRICS
+        )
+        print(f"{name:<28}{cells}")
+        delta = change(before[metric] or 0, after[metric] or 0)
+        # Lower latency is better, higher throughput is better
+        if (delta < -threshold) if metric == "throughput_rps" else (delta > threshold):
+            regressions.append((name, delta))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--metric", default="p95_ms", choices=METRICS)
+    parser.add_argument("--threshold", type=float, default=10.0, help="Allowed change in percent")
+    args = parser.parse_args()
+
+    regressions = compare(json.loads(Path(args.baseline).read_text()), json.loads(Path(args.candidate).read_text()),
+                          args.metric, args.threshold)
+    for name, delta in regressions:
+        print(f"REGRESSION {name}: {args.metric} {delta:+.1f}%")
+    sys.exit(1 if regressions else 0)
@@ -0,0 +1,51 @@
+"""Seed the database from DATABASE_URL with synthetic books shaped like 10_books.json.
+
+Usage: DATABASE_URL=sqlite+aiosqlite:///./bench.db python -m benchmarks.seed --books 10000 --authors 1000 --reset
+"""
+import argparse
+import asyncio
+import io
+import json
+import random
+from pathlib import Path
+from typing import Iterator
+from sqlalchemy import text
+from app.core.config import settings
+from app.core.database import get_session_factory, init_db
+from app.crud.raw_sql_crud import bulk_import_books
+from app.models import author, book, user
+
+SAMPLE_BOOKS = json.loads((Path(__file__).parent.parent / "10_books.json").read_text())
+
+
+def synthesize_books(count: int, authors: int, seed: int = 42) -> Iterator[dict]:
+    rng = random.Random(seed)
+    for index in range(count):
+        sample = SAMPLE_BOOKS[index % len(SAMPLE_BOOKS)]
+        yield {
+            "title": f"{sample['title']} {index}",
+            "genre": rng.choice(settings.SUPPORTED_GENRES),
+            "published_year": rng.randint(1800, 2025),
+            "author": f"{sample['author']} {rng.randrange(authors)}",
+        }
+
+
+async def seed(books: int, authors: int, reset: bool = False) -> dict:
+    await init_db()
+    async with get_session_factory()() as db:
+        if reset:
+            await db.execute(text("DELETE FROM books"))
+            await db.execute(text("DELETE FROM authors"))
+            await db.commit()
+        source = io.StringIO("\n".join(json.dumps(book) for book in synthesize_books(books, authors)))
+        return await bulk_import_books(db, source, "ndjson")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--books", type=int, default=10000)
+    parser.add_argument("--authors", type=int, default=1000)
+    parser.add_argument("--reset", action="store_true", help="Delete existing books and authors first")
+    args = parser.parse_args()
+    summary = asyncio.run(seed(args.books, args.authors, args.reset))
+    print(f"Imported {summary['imported']} books ({summary['failed']} failed)")